@@ -3,6 +3,9 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with `gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker`
+(see "Serving over ASGI" in the README).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -51,12 +51,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.StaticFilesMiddleware",
+    "core.middleware.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "inventory.audit.AuditBufferMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
@@ -66,7 +69,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for REQUEST_METRICS
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,13 +90,15 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# seconds a connection is reused for; set 0 under ASGI (see README)
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
 
 if DATABASE_URL:
     # Render / production
     DATABASES = {
         "default": dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            conn_max_age=DB_CONN_MAX_AGE,
             ssl_require=not DEBUG,
         )
     }
@@ -110,6 +116,109 @@ else:
     }
 
 
+# Read replicas
+# DATABASE_REPLICA_URL: comma-separated URLs of read replicas of the primary.
+# Reports, exports and list views read from them (see core.replicas); writes,
+# stock movements and audit stay on the primary. A client that wrote keeps
+# reading from the primary for REPLICA_PIN_SECONDS, which should exceed the
+# replication lag. Replicas are not migrated; they copy the primary.
+
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
+for i, url in enumerate(u.strip() for u in DATABASE_REPLICA_URL.split(",") if u.strip()):
+    DATABASES["replica" if i == 0 else f"replica_{i + 1}"] = {
+        **dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, ssl_require=not DEBUG),
+        # tests run against the primary's test database
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+
+
+# Cache
+# CACHE_URL picks the backend: locmem:// (default), file:///path/to/dir or
+# redis://host:6379/0. Use Redis when running more than one process, so
+# version bumps reach every worker.
+
+CACHE_URL = os.getenv("CACHE_URL", "locmem://")
+
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("file://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_URL[len("file://"):],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "inventory-pro",
+        }
+    }
+
+# Upper bound on how long a computed result is served; versions are bumped
+# on every change, this only limits staleness with per-process caches
+COMPUTED_CACHE_TTL = int(os.getenv("COMPUTED_CACHE_TTL", "300"))
+
+# Seconds a user's group names are shared across requests (0 = load them
+# once per request). Membership changes clear the entry; with per-process
+# caches other workers may lag by up to this long.
+PERMISSION_CACHE_TTL = int(os.getenv("PERMISSION_CACHE_TTL", "0"))
+
+
+# Sessions
+# SESSION_BACKEND: db (default), cached_db or cache. cached_db reads sessions
+# from the cache and only falls back to the database on a miss; give it a
+# shared cache (CACHE_URL=redis://...) when running more than one process,
+# or a logout in one worker isn't seen by the others.
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+
+
+# Audit log
+# AUDIT_ASYNC=true writes audit rows from a background thread. AUDIT_QUEUE_SIZE
+# bounds the batches waiting for it; when it is full the request writes
+# them itself. Meant for PostgreSQL; SQLite serializes the writers anyway.
+
+AUDIT_ASYNC = os.getenv("AUDIT_ASYNC", "false").lower() == "true"
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "1000"))
+
+# `manage.py archive_audit` moves rows older than AUDIT_RETENTION_DAYS into
+# gzipped NDJSON files (one per day) under AUDIT_ARCHIVE_DIR
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_ARCHIVE_DIR = Path(os.getenv("AUDIT_ARCHIVE_DIR", BASE_DIR / "audit-archive"))
+
+
+# Request metrics
+# REQUEST_METRICS=true adds Server-Timing headers, logs one JSON line per
+# request on the "core.metrics" logger and serves per-view histograms at
+# /metrics/ (staff users, or Authorization: Bearer METRICS_TOKEN).
+
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "false").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.metrics": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -153,3 +262,10 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# Generated report files (served through auth-checked views, not publicly)
+MEDIA_URL = "media/"
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "media"))
+
+# How long finished background job results are kept before the worker deletes them
+EXPORT_JOB_TTL_HOURS = int(os.getenv("EXPORT_JOB_TTL_HOURS", "24"))
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from core.views import dashboard
+from core.views import dashboard, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -26,6 +26,8 @@ urlpatterns = [
     path("accounts/logout/", auth_views.LogoutView.as_view(), name="logout"),
 
     path("", dashboard, name="dashboard"),
+    path("metrics/", metrics, name="metrics"),
+    path("api/v1/", include("inventory.api_urls")),
     path("", include("inventory.urls")),
 
 ]
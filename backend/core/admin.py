@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ApiToken
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    """Lists and revokes (deletes) API tokens; they are issued with `manage.py create_api_token`."""
+
+    list_display = ("user", "name", "created_at", "last_used_at")
+    list_select_related = ("user",)
+    readonly_fields = ("user", "name", "created_at", "last_used_at")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = "Issue a JSON API token for a user (the key is shown once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--name", default="", help="What the token is for, e.g. the integration's name")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']!r}.")
+
+        token, key = ApiToken.issue(user, name=options["name"])
+        self.stdout.write(f"Token {token.pk} for {user.username}. Send it as:")
+        self.stdout.write(f"Authorization: Bearer {key}")
+        self.stdout.write(self.style.WARNING("The key is not stored and can't be shown again."))
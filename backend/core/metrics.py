@@ -0,0 +1,196 @@
+"""
+Request instrumentation.
+
+RequestMetricsMiddleware (enabled with REQUEST_METRICS) times each request
+and splits it into SQL (through time_query, a connection execute_wrapper), template
+rendering (through TimedDjangoTemplates) and view time. Results go into a
+Server-Timing header, one JSON log line on the "core.metrics" logger, and
+per-view histograms in this process that the metrics view renders in the
+Prometheus text format.
+
+Histograms are per process: scrape every worker, or sum them in Prometheus.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+# seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def view_elapsed(self) -> float:
+        return time.perf_counter() - self.view_started if self.view_started else 0.0
+
+
+def current():
+    """Timings of the request being handled, or None."""
+    return _current.get()
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    execute_wrapper on every connection (see install()) that adds to the
+    current request's SQL time. Connections belong to the thread running
+    the ORM, not to the request, so the wrapper stays on and looks up the
+    request through the context variable, which follows sync_to_async().
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql += time.perf_counter() - started
+        timings.queries += 1
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    # the same wrapper object reconnects after CONN_MAX_AGE
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def install():
+    """Times queries on every connection opened from now on."""
+    connection_created.connect(_on_connection_created, dispatch_uid="core.metrics")
+    for connection in connections.all(initialized_only=True):
+        _on_connection_created(None, connection)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing top-level renders while a request
+    is instrumented. Includes are part of their parent's time.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}
+            self.sql = {}
+            self.queries = {}
+            self.responses = {}
+
+    def observe(self, view: str, method: str, status: int, timings: RequestTimings, elapsed: float):
+        with self._lock:
+            self.durations.setdefault((view, method), _Histogram()).observe(elapsed)
+            self.sql.setdefault((view, method), _Histogram()).observe(timings.sql)
+            self.queries[(view, method)] = self.queries.get((view, method), 0) + timings.queries
+            key = (view, method, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            _histogram_lines(
+                lines,
+                "inventory_request_duration_seconds",
+                "Time from the request entering to leaving the middleware stack.",
+                self.durations,
+            )
+            _histogram_lines(
+                lines,
+                "inventory_request_sql_seconds",
+                "Time spent in SQL per request.",
+                self.sql,
+            )
+            lines.append("# HELP inventory_request_queries_total SQL queries run.")
+            lines.append("# TYPE inventory_request_queries_total counter")
+            for (view, method), value in sorted(self.queries.items()):
+                lines.append(f"inventory_request_queries_total{_labels(view=view, method=method)} {value}")
+            lines.append("# HELP inventory_responses_total Responses by status code.")
+            lines.append("# TYPE inventory_responses_total counter")
+            for (view, method, status), value in sorted(self.responses.items()):
+                lines.append(f"inventory_responses_total{_labels(view=view, method=method, status=status)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (view, method), hist in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, hist.buckets):
+            lines.append(f"{name}_bucket{_labels(view=view, method=method, le=bound)} {count}")
+        lines.append(f"{name}_bucket{_labels(view=view, method=method, le='+Inf')} {hist.count}")
+        lines.append(f"{name}_sum{_labels(view=view, method=method)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_labels(view=view, method=method)} {hist.count}")
+
+
+registry = Registry()
@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, replicas
+
+logger = logging.getLogger("core.metrics")
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request SQL/template/view timing (see core.metrics). Keep it first
+    in MIDDLEWARE so the session and auth queries are counted too. Removed
+    at startup unless REQUEST_METRICS is on.
+
+    Streaming responses are timed up to the point the body starts streaming.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self._record(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self._record(request, response, timings)
+
+    def _record(self, request, response, timings):
+        elapsed = timings.elapsed()
+        view = request.resolver_match.view_name if request.resolver_match else "unmatched"
+        metrics.registry.observe(view, request.method, response.status_code, timings, elapsed)
+
+        response["Server-Timing"] = ", ".join([
+            f'sql;dur={timings.sql * 1000:.1f};desc="{timings.queries} queries"',
+            f"tpl;dur={timings.template * 1000:.1f}",
+            f"view;dur={timings.view_elapsed() * 1000:.1f}",
+            f"total;dur={elapsed * 1000:.1f}",
+        ])
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "total_ms": round(elapsed * 1000, 1),
+            "view_ms": round(timings.view_elapsed() * 1000, 1),
+            "sql_ms": round(timings.sql * 1000, 1),
+            "queries": timings.queries,
+            "template_ms": round(timings.template * 1000, 1),
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = metrics.current()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+        return None
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also run async. One sync-only middleware
+    is enough for Django to hop every request of an ASGI server onto a
+    worker thread, which would undo the async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG: looks on disk
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for core.replicas: a client whose request wrote
+    anything reads from the primary for the next REPLICA_PIN_SECONDS
+    (a cookie, so it holds across worker processes). Removed at startup
+    unless a replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas.aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = replicas.begin(pinned=replicas.PIN_COOKIE in request.COOKIES)
+        return self._pin(state, self.get_response(request))
+
+    async def __acall__(self, request):
+        state = replicas.begin(pinned=replicas.PIN_COOKIE in request.COOKIES)
+        return self._pin(state, await self.get_response(request))
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                replicas.PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
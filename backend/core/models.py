@@ -1,3 +1,35 @@
+import hashlib
+import secrets
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ApiToken(models.Model):
+    """
+    Key for the JSON API, sent as `Authorization: Bearer <key>`. Only a
+    hash of the key is stored; issue() returns the key once.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="api_tokens")
+    name = models.CharField(max_length=100, blank=True)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.user} {self.name}".strip()
+
+    @staticmethod
+    def hash(key: str) -> str:
+        # keys are 256 random bits, so a fast hash is enough
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name: str = ""):
+        """Creates a token for `user`; returns (token, key)."""
+        key = secrets.token_urlsafe(32)
+        return cls.objects.create(user=user, name=name, key_hash=cls.hash(key)), key
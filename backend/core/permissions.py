@@ -1,7 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+GROUPS_KEY = "perm:groups:{}"
+# bumped when a group is renamed or deleted, which can't be traced to users
+GENERATION_KEY = "perm:groups:gen"
+
+
+def group_names(user) -> frozenset:
+    """
+    Names of the user's groups, loaded once per request (kept on the user
+    object) and, with PERMISSION_CACHE_TTL > 0, shared across requests.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    names = getattr(user, "_group_names", None)
+    if names is not None:
+        return names
+
+    ttl = getattr(settings, "PERMISSION_CACHE_TTL", 0)
+    if ttl:
+        key = GROUPS_KEY.format(user.pk)
+        found = cache.get_many([key, GENERATION_KEY])
+        generation = found.get(GENERATION_KEY, 0)
+        cached = found.get(key)
+        if cached is not None and cached[0] == generation:
+            names = cached[1]
+        else:
+            names = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, (generation, names), ttl)
+    else:
+        names = frozenset(user.groups.values_list("name", flat=True))
+
+    user._group_names = names
+    return names
+
+
+def forget_groups(*user_ids):
+    """
+    Drops cached group names after a membership change, once the current
+    transaction commits (like inventory.cache.bump): dropping them earlier
+    lets a concurrent request cache the old membership again.
+    """
+    keys = [GROUPS_KEY.format(pk) for pk in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_all_groups():
+    transaction.on_commit(_next_generation)
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
 
 def in_group(user, group_name: str) -> bool:
-    return user.is_authenticated and user.groups.filter(name=group_name).exists()
+    return group_name in group_names(user)
 
 def require_group(group_name: str):
     def decorator(view_func):
@@ -0,0 +1,132 @@
+"""
+Read replicas (DATABASE_REPLICA_URL).
+
+ReplicaRouter sends a read to a replica only where the code opted in:
+views decorated with @use_replica (reports, exports, list views) and blocks
+inside `with replica_reads():` (export jobs). Everything else, and every
+write, uses the primary ("default").
+
+Read-your-writes: ReplicaPinMiddleware gives each request a _State. A
+write routed during the request flips it to the primary for the rest of
+the request and sets a cookie that keeps the client's reads on the primary
+for REPLICA_PIN_SECONDS, which has to cover the replication lag. Reads
+inside a transaction on the primary stay there too.
+
+The state is not reset when the view returns, so streamed responses keep
+reading from the replica; request_finished clears it.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "primary_reads"
+
+_state = ContextVar("replica_state", default=None)
+
+
+@dataclass
+class _State:
+    replica: bool = False
+    pinned: bool = False
+    wrote: bool = False
+    # False where reads never depend on the block's own writes (jobs)
+    pin_on_write: bool = True
+    alias: str = None
+
+
+def aliases():
+    """Configured replica aliases ("replica", "replica_2", ...)."""
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def begin(pinned: bool = False) -> _State:
+    """Starts a request's state; `pinned` keeps all its reads on the primary."""
+    state = _State(pinned=pinned)
+    _state.set(state)
+    return state
+
+
+def _end(**kwargs):
+    _state.set(None)
+
+
+request_finished.connect(_end)
+
+
+def reading_replica() -> bool:
+    """True if a read issued now would go to a replica."""
+    state = _state.get()
+    return (
+        state is not None
+        and state.replica
+        and not (state.pinned or state.wrote)
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        and bool(aliases())
+    )
+
+
+def use_replica(view):
+    """Lets `view`'s reads (and its streamed response's) go to a replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            _allow()
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            _allow()
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _allow():
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+@contextmanager
+def replica_reads():
+    """Reads inside the block may go to a replica (for code outside requests)."""
+    token = _state.set(_State(replica=True, pin_on_write=False))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reading_replica():
+            return None
+        state = _state.get()
+        if state.alias is None:
+            # one replica per request, so its reads agree with each other
+            state.alias = random.choice(aliases())
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.pin_on_write:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema from the primary
+        if db in aliases():
+            return False
+        return None
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .permissions import forget_all_groups, forget_groups
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear
+        forget_groups(instance.pk)
+    elif pk_set:
+        # group.user_set.add/remove
+        forget_groups(*pk_set)
+    else:
+        # group.user_set.clear(): the members are already gone
+        forget_all_groups()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, created=False, **kwargs):
+    if not created:
+        forget_all_groups()
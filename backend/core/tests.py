@@ -1,3 +1,122 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Category, Product
+
+from . import replicas
+from .middleware import ReplicaPinMiddleware
+from .replicas import ReplicaRouter, reading_replica, replica_reads, use_replica
+
+
+def with_replica(test_case):
+    """Pretends a replica alias is configured (routing decisions only, no queries)."""
+    patcher = mock.patch.object(replicas, "aliases", return_value=["replica"])
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    test_case.addCleanup(replicas._end)
+
+
+@use_replica
+def replica_view(request):
+    return reading_replica()
+
+
+# not TestCase: its per-test transaction would keep every read on the primary
+class ReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        with_replica(self)
+        self.router = ReplicaRouter()
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_only_opted_in_views_read_from_the_replica(self):
+        replicas.begin()
+        self.assertIsNone(self.router.db_for_read(Product))
+
+        self.assertTrue(replica_view(None))
+        self.assertEqual(self.router.db_for_read(Product), "replica")
+
+    def test_a_write_moves_the_rest_of_the_request_to_the_primary(self):
+        state = replicas.begin()
+        replica_view(None)
+
+        self.assertEqual(self.router.db_for_write(Product), "default")
+        self.assertTrue(state.wrote)
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_a_pinned_client_reads_from_the_primary(self):
+        replicas.begin(pinned=True)
+        self.assertFalse(replica_view(None))
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        replicas.begin()
+        replica_view(None)
+        with transaction.atomic():
+            self.assertIsNone(self.router.db_for_read(Product))
+        self.assertEqual(self.router.db_for_read(Product), "replica")
+
+    def test_replica_reads_block_is_not_pinned_by_writes(self):
+        with replica_reads():
+            self.router.db_for_write(Product)
+            self.assertEqual(self.router.db_for_read(Product), "replica")
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "inventory"))
+        self.assertIsNone(self.router.allow_migrate("default", "inventory"))
+
+
+class ReplicaPinCookieTests(TransactionTestCase):
+    def setUp(self):
+        with_replica(self)
+        self.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def test_a_writing_request_sets_the_pin_cookie(self):
+        response = self.client.post("/categories/new/", {"name": "Fasteners"})
+
+        self.assertTrue(Category.objects.filter(name="Fasteners").exists())
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie["httponly"])
+
+    def test_a_read_only_request_does_not(self):
+        response = self.client.get("/categories/new/")
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_middleware_is_dropped_without_replicas(self):
+        with mock.patch.object(replicas, "aliases", return_value=[]):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaPinMiddleware(lambda request: None)
+
+
+@skipUnless("replica" in settings.DATABASES, "needs DATABASE_REPLICA_URL (mirrored to the test database)")
+class ReplicaMirrorTests(TransactionTestCase):
+    """End to end against the replica alias, which tests mirror to the primary's database."""
+
+    # the runner collects this even when the class is skipped
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def replica_queries(self):
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            self.assertEqual(self.client.get("/products/").status_code, 200)
+        return len(queries)
+
+    def test_list_view_reads_from_the_replica_unless_pinned(self):
+        self.assertGreater(self.replica_queries(), 0)
+
+        self.client.post("/categories/new/", {"name": "Fasteners"})
+        self.assertIn(replicas.PIN_COOKIE, self.client.cookies)
+        self.assertEqual(self.replica_queries(), 0)
@@ -1,38 +1,66 @@
 from datetime import timedelta
-from django.db import models
-from django.db.models import Sum
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
 from django.utils import timezone
 
-from inventory.models import Product, InventoryTransaction
+from inventory import fragments
+from inventory.cache import cached
+from inventory.models import Product
+from inventory.rollups import top_movers
+
+from .metrics import registry
+from .replicas import use_replica
 
 
 @login_required
+@use_replica
 def dashboard(request):
-    # Low stock products
-    low_stock = (
-        Product.objects.select_related("category")
-        .filter(is_active=True, quantity_on_hand__lte=models.F("reorder_level"))
-        .order_by("quantity_on_hand", "name")[:10]
-    )
+    def widgets_context():
+        # Low stock products
+        low_stock = cached(
+            "dashboard_low_stock",
+            ["products"],
+            lambda: list(
+                Product.objects.select_related("category")
+                .filter(is_active=True, is_low_stock=True)
+                .order_by("quantity_on_hand", "name")[:10]
+            ),
+        )
 
-    # Top movers last 30 days (sum of IN + OUT separately is fine; we’ll sum absolute moved qty)
-    since = timezone.now() - timedelta(days=30)
+        # Top movers last 30 days (IN + OUT moved qty), read from the daily rollup
+        # so the cost doesn't grow with raw transaction volume
+        since = timezone.now() - timedelta(days=30)
+        movers = cached(
+            "dashboard_movers",
+            ["transactions", "products"],
+            lambda: top_movers(days=30, limit=10),
+        )
+        return {"low_stock": low_stock, "movers": movers, "since": since.date()}
 
-    movers = (
-        InventoryTransaction.objects.filter(created_at__gte=since)
-        .values("product_id", "product__name", "product__sku")
-        .annotate(moved_qty=Sum("quantity"))
-        .order_by("-moved_qty")[:10]
+    # the widgets poll for updates with HTMX and get just this fragment
+    widgets = fragments.results(
+        request, "dashboard_widgets", "core/partials/dashboard_widgets.html",
+        ["products", "transactions"], widgets_context,
     )
+    return fragments.respond(request, "core/dashboard.html", widgets)
 
-    return render(
-        request,
-        "core/dashboard.html",
-        {
-            "low_stock": low_stock,
-            "movers": movers,
-            "since": since.date(),
-        },
-    )
+
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format, for staff users or a
+    scraper sending `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    if not settings.REQUEST_METRICS:
+        raise Http404
+
+    token = settings.METRICS_TOKEN
+    auth = request.headers.get("Authorization", "")
+    if not (token and constant_time_compare(auth, f"Bearer {token}")):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            raise PermissionDenied("Staff only.")
+
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,291 @@
+"""
+JSON API, version 1 (mounted at /api/v1/, routes in inventory.api_urls).
+
+Requests authenticate with the site session (browser; unsafe methods need
+the CSRF token as usual) or with an API token sent as
+`Authorization: Bearer <key>` (see core.models.ApiToken).
+
+List endpoints
+- return only the fields named in ?fields=a,b,c (default: all),
+- are keyset-paginated: ?limit= (default 100, at most 1000) rows per page
+  and {"results": [...], "next": url, "previous": url}; follow the links,
+  cursors are opaque,
+- read rows with values(), so no model instances are built.
+
+POST products/bulk/ creates or updates up to BULK_MAX products keyed by SKU
+(inventory.catalog): all rows are validated first and nothing is written
+unless every row is valid.
+"""
+import json
+from datetime import datetime, time as dt_time
+from functools import wraps
+
+from django.core.exceptions import RequestDataTooBig
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+
+from core.models import ApiToken
+from core.permissions import in_group
+from core.replicas import use_replica
+
+from . import catalog
+from .models import Category, InventoryTransaction, Product
+from .pagination import keyset_paginate
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+BULK_MAX = 10_000
+
+# how often a token's last_used_at is written
+TOKEN_TOUCH_SECONDS = 3600
+
+# API field name -> ORM path
+PRODUCT_FIELDS = {
+    "id": "id",
+    "sku": "sku",
+    "name": "name",
+    "category": "category__name",
+    "cost": "cost",
+    "price": "price",
+    "reorder_level": "reorder_level",
+    "quantity_on_hand": "quantity_on_hand",
+    "is_active": "is_active",
+    "is_low_stock": "is_low_stock",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+CATEGORY_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "created_at": "created_at",
+}
+TRANSACTION_FIELDS = {
+    "id": "id",
+    "product": "product__sku",
+    "type": "transaction_type",
+    "quantity": "quantity",
+    "balance_after": "balance_after",
+    "unit_cost": "unit_cost",
+    "reference": "reference",
+    "note": "note",
+    "created_by": "created_by__username",
+    "created_at": "created_at",
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _error(status: int, *errors):
+    return JsonResponse({"ok": False, "errors": list(errors)}, status=status)
+
+
+def _token_user(request):
+    """
+    The user of the Bearer token, None without an Authorization header.
+    Raises ApiError for a bad token (no fallback to the session then).
+    """
+    header = request.headers.get("Authorization", "")
+    if not header:
+        return None
+    scheme, _, key = header.partition(" ")
+    if scheme.lower() != "bearer" or not key:
+        raise ApiError(401, "Use Authorization: Bearer <key>.")
+
+    token = ApiToken.objects.select_related("user").filter(key_hash=ApiToken.hash(key.strip())).first()
+    if token is None or not token.user.is_active:
+        raise ApiError(401, "Invalid API token.")
+
+    now = timezone.now()
+    if token.last_used_at is None or (now - token.last_used_at).total_seconds() > TOKEN_TOUCH_SECONDS:
+        ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+    return token.user
+
+
+def api_view(*methods):
+    """
+    Allows `methods`, authenticates (token or session) and turns ApiError
+    into a JSON error response.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _error(405, f"Method {request.method} not allowed.")
+            try:
+                user = _token_user(request)
+                if user is not None:
+                    request.user = user
+                elif not request.user.is_authenticated:
+                    return _error(401, "Authentication required.")
+                elif request.method not in ("GET", "HEAD", "OPTIONS"):
+                    # session auth: same CSRF protection as the site's forms
+                    if CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {}) is not None:
+                        return _error(403, "CSRF check failed.")
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                return _error(exc.status, exc.message)
+        return wrapper
+    return decorator
+
+
+def _fields(request, available: dict):
+    """[(name, ORM path)] selected by ?fields=, all of them by default."""
+    raw = request.GET.get("fields", "").strip()
+    if not raw:
+        return list(available.items())
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}.")
+    return [(name, available[name]) for name in dict.fromkeys(names)]
+
+
+def _limit(request) -> int:
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be a number.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _moment(request, name: str):
+    """?name= as an aware datetime (an ISO datetime, or a date for its local midnight)."""
+    raw = request.GET.get(name, "").strip()
+    if not raw:
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = datetime.combine(day, dt_time.min) if day else None
+    except ValueError:
+        value = None
+    if value is None:
+        raise ApiError(400, f"{name} must be an ISO date or datetime.")
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+def _list(request, qs, available: dict, keys):
+    """One page of `qs` as {"results", "next", "previous"}."""
+    fields = _fields(request, available)
+    paths = list(dict.fromkeys([path for _, path in fields] + [f for f, _ in keys]))
+    page = keyset_paginate(
+        qs.values(*paths),
+        keys,
+        cursor=request.GET.get("cursor", ""),
+        per_page=_limit(request),
+    )
+    return JsonResponse({
+        "results": [{name: row[path] for name, path in fields} for row in page],
+        "next": _page_url(request, page.next_cursor),
+        "previous": _page_url(request, page.prev_cursor),
+    })
+
+
+@api_view("GET")
+@use_replica
+def products(request):
+    """?category=<name>, ?active=1|0, ?low_stock=1, ?updated_since=<ISO date/datetime>."""
+    qs = Product.objects.all()
+    if request.GET.get("category"):
+        qs = qs.filter(category__name=request.GET["category"])
+    if request.GET.get("active") in ("1", "0"):
+        qs = qs.filter(is_active=request.GET["active"] == "1")
+    if request.GET.get("low_stock") == "1":
+        qs = qs.filter(is_low_stock=True)
+    updated_since = _moment(request, "updated_since")
+    if updated_since:
+        qs = qs.filter(updated_at__gte=updated_since)
+    return _list(request, qs, PRODUCT_FIELDS, [("id", False)])
+
+
+@api_view("GET")
+def product_detail(request, sku):
+    fields = _fields(request, PRODUCT_FIELDS)
+    row = Product.objects.filter(sku=sku).values(*[path for _, path in fields]).first()
+    if row is None:
+        return _error(404, f"No product with SKU {sku!r}.")
+    return JsonResponse({name: row[path] for name, path in fields})
+
+
+@api_view("POST")
+def products_bulk(request):
+    """
+    Body: {"products": [{"sku", "name", "category", "cost", "price",
+    "reorder_level", "is_active"}, ...]}. Categories are names and are
+    created when missing; quantity_on_hand is not accepted.
+    """
+    if not (in_group(request.user, "Admin") or request.user.is_superuser):
+        return _error(403, "You do not have permission to change products.")
+
+    try:
+        payload = json.loads(request.body)
+    except RequestDataTooBig:
+        return _error(413, "Request body too large; send fewer products per request.")
+    except ValueError:
+        return _error(400, "Invalid JSON body.")
+    rows = payload.get("products") if isinstance(payload, dict) else None
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return _error(400, 'Expected {"products": [{...}, ...]}.')
+    if len(rows) > BULK_MAX:
+        return _error(400, f"At most {BULK_MAX} products per request.")
+
+    valid, invalid = catalog.validate(rows)
+    if invalid:
+        return _error(400, *[
+            {"index": index, "sku": row.get("sku"), "errors": errors}
+            for index, row, errors in invalid
+        ])
+
+    result = catalog.upsert_products(valid, user=request.user)
+    return JsonResponse({
+        "ok": True,
+        "created": result.created,
+        "updated": result.updated,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+        "rows_per_second": round(result.rows_per_second, 1),
+    })
+
+
+@api_view("GET")
+@use_replica
+def categories(request):
+    return _list(request, Category.objects.all(), CATEGORY_FIELDS, [("name", False), ("id", False)])
+
+
+@api_view("GET")
+@use_replica
+def transactions(request):
+    """?product=<sku>, ?type=IN|OUT, ?since= / ?until= (ISO date or datetime), newest first."""
+    qs = InventoryTransaction.objects.all()
+    if request.GET.get("product"):
+        product_id = Product.objects.filter(sku=request.GET["product"]).values_list("pk", flat=True).first()
+        if product_id is None:
+            return _error(404, f"No product with SKU {request.GET['product']!r}.")
+        qs = qs.filter(product_id=product_id)
+    if request.GET.get("type") in ("IN", "OUT"):
+        qs = qs.filter(transaction_type=request.GET["type"])
+    since = _moment(request, "since")
+    if since:
+        qs = qs.filter(created_at__gte=since)
+    until = _moment(request, "until")
+    if until:
+        qs = qs.filter(created_at__lt=until)
+    return _list(request, qs, TRANSACTION_FIELDS, [("created_at", True), ("id", True)])
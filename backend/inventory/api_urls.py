@@ -0,0 +1,12 @@
+from django.urls import path
+from . import api
+
+app_name = "api"
+
+urlpatterns = [
+    path("products/", api.products, name="products"),
+    path("products/bulk/", api.products_bulk, name="products_bulk"),
+    path("products/<str:sku>/", api.product_detail, name="product_detail"),
+    path("categories/", api.categories, name="categories"),
+    path("transactions/", api.transactions, name="transactions"),
+]
@@ -1,10 +1,192 @@
+"""
+Audit log writer.
+
+Events are never written inline with the domain change. Each one is handed
+over by `transaction.on_commit`, so events of a transaction that rolls back
+are dropped, and collected in the current `collect()` scope (one per request,
+see AuditBufferMiddleware). The scope is flushed with a single bulk INSERT
+when it ends. Outside a scope committed events are written right away.
+
+With AUDIT_ASYNC the flush hands the rows to a background thread instead.
+Its queue is bounded (AUDIT_QUEUE_SIZE batches); when it is full the caller
+writes the rows itself, and the queue is drained when the process exits.
+"""
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
 from .models import AuditLog
 
-def log(actor, action: str, entity_type: str, entity_id: int, message: str = ""):
-    AuditLog.objects.create(
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+_buffer = ContextVar("audit_buffer", default=None)
+
+
+def entry(actor, action: str, entity_type: str, entity_id: int, message: str = "") -> AuditLog:
+    return AuditLog(
         actor=actor,
         action=action,
         entity_type=entity_type,
         entity_id=entity_id,
         message=message[:255],
+        created_at=timezone.now(),
     )
+
+def log(actor, action: str, entity_type: str, entity_id: int, message: str = ""):
+    log_many([entry(actor, action, entity_type, entity_id, message)])
+
+def log_many(entries, batch_size: int = BATCH_SIZE):
+    entries = list(entries)
+    if entries:
+        transaction.on_commit(lambda: _committed(entries, batch_size))
+
+
+def _committed(entries, batch_size):
+    buffered = _buffer.get()
+    if buffered is not None:
+        buffered.extend(entries)
+    else:
+        _write(entries, batch_size)
+
+
+@contextmanager
+def collect():
+    """
+    Buffers committed audit events until the block ends, then writes them
+    in one go. Nested scopes share the outermost buffer.
+    """
+    if _buffer.get() is not None:
+        yield
+        return
+
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        entries = _buffer.get()
+        _buffer.reset(token)
+        if entries:
+            _write(entries)
+
+
+class AuditBufferMiddleware:
+    """Flushes each request's audit events with one bulk INSERT."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # collect(), with the flush moved off the event loop; sync views
+        # run with a copy of this context and append to the same list
+        if _buffer.get() is not None:
+            return await self.get_response(request)
+
+        token = _buffer.set([])
+        try:
+            return await self.get_response(request)
+        finally:
+            entries = _buffer.get()
+            _buffer.reset(token)
+            if entries:
+                await sync_to_async(_write)(entries)
+
+
+def _write(entries, batch_size: int = BATCH_SIZE):
+    if getattr(settings, "AUDIT_ASYNC", False) and _writer.submit(entries):
+        return
+    AuditLog.objects.bulk_create(entries, batch_size=batch_size)
+
+
+class _BackgroundWriter:
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, entries) -> bool:
+        """Queues `entries`; False if the queue is full."""
+        self._start()
+        try:
+            self._queue.put_nowait(entries)
+        except queue.Full:
+            return False
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._queue = queue.Queue(maxsize=getattr(settings, "AUDIT_QUEUE_SIZE", 1000))
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.drain)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            # coalesce whatever else is waiting into the same INSERTs
+            batch, taken, stop = list(item), 1, False
+            while len(batch) < BATCH_SIZE:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+
+            try:
+                AuditLog.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+            except Exception:
+                logger.exception("Failed to write %d audit events", len(batch))
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+            if stop:
+                break
+        connection.close()
+
+    def flush(self):
+        """Blocks until everything queued so far is written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def drain(self, timeout: float = 30):
+        """Writes what is left and stops the thread (runs at exit)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+
+_writer = _BackgroundWriter()
+flush = _writer.flush
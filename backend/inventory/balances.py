@@ -0,0 +1,103 @@
+"""
+Running balances (InventoryTransaction.balance_after).
+
+The stock service writes each movement's balance with it, under the
+product's row lock. backfill() fills in rows that predate the column (and
+repairs any that drifted) with one window-function UPDATE per chunk of
+products: a product's balances are anchored to its current
+quantity_on_hand and walked back through its ledger, newest first, so the
+newest row always agrees with the product. drift() is the reconciliation
+check: products whose newest movement doesn't match quantity_on_hand.
+"""
+import time
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+
+from .cache import bump
+from .models import InventoryTransaction, Product
+
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class BackfillResult:
+    products: int
+    updated: int
+    elapsed: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.updated / self.elapsed if self.elapsed else 0.0
+
+
+def _backfill_sql():
+    qn = connection.ops.quote_name
+    tx = qn(InventoryTransaction._meta.db_table)
+    product = qn(Product._meta.db_table)
+    signed = "CASE WHEN t.transaction_type = %s THEN t.quantity ELSE -t.quantity END"
+    # balance after a row = on hand now - everything moved after it
+    #                      = on hand now - product total + total up to the row
+    return (
+        f"UPDATE {tx} SET balance_after = b.balance FROM ("
+        f"SELECT t.id, p.quantity_on_hand"
+        f" - SUM({signed}) OVER (PARTITION BY t.product_id)"
+        f" + SUM({signed}) OVER (PARTITION BY t.product_id ORDER BY t.created_at, t.id"
+        f" ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS balance"
+        f" FROM {tx} t JOIN {product} p ON p.id = t.product_id"
+        f" WHERE t.product_id BETWEEN %s AND %s"
+        f") b WHERE {tx}.id = b.id"
+        f" AND ({tx}.balance_after IS NULL OR {tx}.balance_after <> b.balance)"
+    )
+
+
+def backfill(chunk_size: int = CHUNK_SIZE, progress=None) -> BackfillResult:
+    """
+    Recomputes balance_after for every product's ledger, `chunk_size`
+    products per transaction; only rows whose value changes are written, so
+    a second run is cheap. `progress(products_done, total)` is called after
+    each chunk.
+
+    Each chunk locks its products first (in pk order, like the stock
+    service), so a movement recorded meanwhile waits for the chunk instead
+    of racing the anchor.
+    """
+    started = time.perf_counter()
+    # products with movements, read off the (product, created_at) index
+    ids = list(
+        InventoryTransaction.objects.order_by("product_id").values_list("product_id", flat=True).distinct()
+    )
+    sql = _backfill_sql()
+    updated = 0
+    for i in range(0, len(ids), chunk_size):
+        lo, hi = ids[i], ids[min(i + chunk_size, len(ids)) - 1]
+        with transaction.atomic():
+            list(Product.objects.select_for_update().filter(pk__range=(lo, hi)).order_by("pk").values_list("pk"))
+            with connection.cursor() as cursor:
+                cursor.execute(sql, ["IN", "IN", lo, hi])
+                updated += cursor.rowcount
+        if progress:
+            progress(min(i + chunk_size, len(ids)), len(ids))
+    if updated:
+        # bulk UPDATE sends no signals
+        bump("transactions")
+    return BackfillResult(products=len(ids), updated=updated, elapsed=time.perf_counter() - started)
+
+
+def drift():
+    """
+    Products with movements whose newest balance_after is missing or differs
+    from quantity_on_hand, annotated with `last_balance`.
+    """
+    newest = (
+        InventoryTransaction.objects.filter(product=OuterRef("pk"))
+        .order_by("-created_at", "-id")
+        .values("balance_after")[:1]
+    )
+    return (
+        Product.objects.filter(Exists(InventoryTransaction.objects.filter(product=OuterRef("pk"))))
+        .annotate(last_balance=Subquery(newest))
+        .filter(Q(last_balance__isnull=True) | ~Q(last_balance=F("quantity_on_hand")))
+        .order_by("pk")
+    )
@@ -0,0 +1,111 @@
+"""
+Versioned cache for computed results (dashboard widgets, category counts,
+rendered list fragments).
+
+Each result declares the data it depends on ("products", "categories",
+"transactions"). Its cache key embeds the current version of each of those
+namespaces, and writes bump the versions (from model signals and the stock
+service), so stale entries are simply never read again and age out.
+
+Results computed from a read replica are kept apart from those computed on
+the primary: a replica that lags a write can cache a result that misses it
+(until the next bump or COMPUTED_CACHE_TTL), and the client that wrote,
+which reads from the primary, must not be served that one.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.replicas import reading_replica
+
+NAMESPACES = ("products", "categories", "transactions")
+
+# names passed to cached(), reported by `manage.py cache_stats`
+RESULTS = (
+    "dashboard_low_stock", "dashboard_movers", "category_list", "dashboard_widgets",
+    "product_results", "transaction_results",
+)
+
+VERSION_KEY = "inv:ver:{}"
+STATS_KEY = "inv:stats:{}:{}"
+
+
+def versions(namespaces):
+    keys = [VERSION_KEY.format(ns) for ns in namespaces]
+    found = cache.get_many(keys)
+    missing = {k: 1 for k in keys if k not in found}
+    if missing:
+        # add() so two processes initialising at once agree on the version
+        for key, value in missing.items():
+            cache.add(key, value, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    return [found.get(k, 1) for k in keys]
+
+
+def _bump_now(namespaces):
+    for ns in namespaces:
+        key = VERSION_KEY.format(ns)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # not set yet (or evicted): any fresh value invalidates old keys
+            cache.set(key, 2, timeout=None)
+
+
+def bump(*namespaces):
+    """
+    Invalidates everything depending on `namespaces` once the current
+    transaction commits (immediately outside a transaction). Bumping before
+    commit would let a concurrent reader cache pre-commit data under the new
+    version.
+    """
+    transaction.on_commit(lambda: _bump_now(namespaces))
+
+
+def invalidate_all():
+    """Forces every cached result to be recomputed on next read."""
+    _bump_now(NAMESPACES)
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def cached(name: str, depends_on, compute, timeout=None, variant: str = ""):
+    """
+    Returns compute()'s result, cached under the current versions of
+    `depends_on`. `variant` tells apart results of the same name computed
+    for different inputs (e.g. a hash of the filters).
+    """
+    key = f"inv:{name}:" + (f"{variant}:" if variant else "") + ":".join(
+        f"{ns}{v}" for ns, v in zip(depends_on, versions(depends_on))
+    )
+    if reading_replica():
+        key += ":replica"
+    value = cache.get(key)
+    if value is not None:
+        _count(name, "hit")
+        return value
+
+    _count(name, "miss")
+    value = compute()
+    cache.set(key, value, timeout=settings.COMPUTED_CACHE_TTL if timeout is None else timeout)
+    return value
+
+
+def stats(names):
+    """{name: (hits, misses)} for the given cached result names."""
+    keys = [STATS_KEY.format(n, o) for n in names for o in ("hit", "miss")]
+    found = cache.get_many(keys)
+    return {
+        n: (found.get(STATS_KEY.format(n, "hit"), 0), found.get(STATS_KEY.format(n, "miss"), 0))
+        for n in names
+    }
+
+
+def reset_stats(names):
+    cache.delete_many([STATS_KEY.format(n, o) for n in names for o in ("hit", "miss")])
@@ -0,0 +1,350 @@
+"""
+Bulk catalog writes.
+
+upsert_products() creates or updates products keyed by SKU: per chunk of
+rows that is one locking SELECT of the existing SKUs, raw multi-row
+INSERT ... ON CONFLICT DO UPDATE statements, and bulk inserts of the
+low-stock events and audit rows, instead of a form save (and its queries)
+per product. Each chunk runs in a savepoint and is redone if another
+transaction inserts one of its SKUs between the SELECT and the INSERT.
+
+Rows are validated first with the same rules as ProductForm, without a
+query per row. Categories are referenced by name and created when missing.
+Stock levels are not part of the catalog: new products start at 0 and
+quantity_on_hand only changes through the stock service.
+
+import_csv() streams a CSV through the same path one chunk at a time, each
+chunk in its own transaction, so a catalog of any size is imported without
+holding the file in memory; rejected rows are written to an error CSV.
+An import is audited with one entry per chunk rather than one per product.
+"""
+import csv
+import time
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .audit import entry, log, log_many
+from .cache import bump
+from .forms import clean_category_name, product_rule_errors
+from .models import Category, LowStockEvent, Product
+
+FIELDS = ("sku", "name", "category", "cost", "price", "reorder_level", "is_active")
+REQUIRED = ("sku", "name", "category", "cost", "price")
+
+PRODUCT_COLUMNS = (
+    "sku", "name", "category_id", "cost", "price", "reorder_level", "is_active",
+    "quantity_on_hand", "is_low_stock", "created_at", "updated_at",
+)
+# what an upsert overwrites on an existing product (is_low_stock is recomputed
+# from the row's own quantity)
+UPDATE_COLUMNS = ("name", "category_id", "cost", "price", "reorder_level", "is_active", "updated_at")
+EVENT_COLUMNS = ("product_id", "became_low", "quantity_on_hand", "reorder_level", "created_at")
+
+CHUNK_SIZE = 1000
+
+# import_csv() refreshes the products table's planner statistics whenever it
+# has added at least this many rows and doubled the table since the last time
+ANALYZE_MIN_ROWS = 10_000
+
+# the model fields clean_row() runs, looked up once
+_FIELDS = {name: Product._meta.get_field(name) for name in ("sku", "name", "cost", "price", "reorder_level", "is_active")}
+_CATEGORY_NAME = Category._meta.get_field("name")
+
+
+class CatalogError(Exception):
+    pass
+
+
+class _Raced(Exception):
+    """Another transaction inserted one of the chunk's SKUs after its locking SELECT."""
+
+
+@dataclass
+class UpsertResult:
+    created: int
+    updated: int
+    elapsed: float
+
+    @property
+    def rows(self) -> int:
+        return self.created + self.updated
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class ImportResult(UpsertResult):
+    rejected: int = 0
+
+
+def clean_row(row: dict):
+    """
+    Validates one row (a dict of FIELDS, values as strings or JSON types).
+    Returns (values, errors): the model values, or messages for what is wrong.
+    """
+    values, errors = {}, []
+    for name in REQUIRED:
+        if row.get(name) in (None, ""):
+            errors.append(f"{name}: This field is required.")
+    if errors:
+        return None, errors
+
+    for name, field in _FIELDS.items():
+        raw = row.get(name)
+        if raw in (None, ""):
+            continue
+        if name == "is_active" and isinstance(raw, str):
+            raw = raw.strip().lower() in ("1", "true", "yes", "y")
+        elif isinstance(raw, str):
+            raw = raw.strip()
+        elif isinstance(raw, float):
+            # JSON numbers: 19.9, not 19.899999999999998578914528479799628257751464843750
+            raw = str(raw)
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors.extend(f"{name}: {message}" for message in exc.messages)
+
+    values.setdefault("reorder_level", 0)
+    values.setdefault("is_active", True)
+
+    if isinstance(row["category"], str):
+        try:
+            values["category"] = _CATEGORY_NAME.clean(clean_category_name(row["category"]), None)
+        except ValidationError as exc:
+            errors.extend(f"category: {message}" for message in exc.messages)
+    else:
+        errors.append("category: Enter a category name.")
+
+    if not errors:
+        errors.extend(f"{name}: {message}" for name, message in product_rule_errors(values))
+    return (None, errors) if errors else (values, [])
+
+
+def validate(rows):
+    """
+    (valid, invalid): cleaned values for the good rows, and
+    (index, row, errors) for the others. Within the rows the last
+    occurrence of a SKU wins, as it would with one save per row.
+    """
+    valid, invalid = {}, []
+    for index, row in enumerate(rows):
+        values, errors = clean_row(row)
+        if errors:
+            invalid.append((index, row, errors))
+        else:
+            valid.pop(values["sku"], None)
+            valid[values["sku"]] = values
+    return list(valid.values()), invalid
+
+
+def _categories(names):
+    """{name: Category}, creating the missing ones."""
+    found = {c.name: c for c in Category.objects.filter(name__in=names)}
+    missing = [Category(name=name) for name in names if name not in found]
+    if missing:
+        Category.objects.bulk_create(missing, ignore_conflicts=True)
+        found.update((c.name, c) for c in Category.objects.filter(name__in=[c.name for c in missing]))
+        bump("categories")
+    return found
+
+
+def _insert(cursor, model, columns, rows, suffix=""):
+    """
+    Multi-row INSERTs of `rows` (tuples of database values) into `model`'s
+    table, as many rows per statement as the backend allows. Returns what
+    the statements return (with a RETURNING `suffix`).
+    """
+    qn = connection.ops.quote_name
+    head = f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(c) for c in columns)}) VALUES "
+    row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    batch = max(1, connection.ops.bulk_batch_size(columns, rows))
+    returned = []
+    for i in range(0, len(rows), batch):
+        part = rows[i:i + batch]
+        cursor.execute(head + ", ".join([row_sql] * len(part)) + suffix, [v for row in part for v in row])
+        if "RETURNING" in suffix:
+            returned += cursor.fetchall()
+    return returned
+
+
+def _upsert_chunk(rows, user, now, audit):
+    skus = [values["sku"] for values in rows]
+    # lock the existing rows (in pk order, like the stock service) so their
+    # quantity can't move between computing is_low_stock and writing it
+    existing = {
+        sku: (pk, qty, was_low)
+        for pk, sku, qty, was_low in Product.objects.select_for_update()
+        .filter(sku__in=skus)
+        .order_by("pk")
+        .values_list("pk", "sku", "quantity_on_hand", "is_low_stock")
+    }
+    categories = _categories(sorted({values["category"] for values in rows}))
+
+    # raw INSERTs: preparing every value through the ORM cost more than the
+    # statements themselves (values are already clean, see clean_row())
+    stamp = connection.ops.adapt_datetimefield_value(now)
+    products = []
+    for values in rows:
+        qty = existing[values["sku"]][1] if values["sku"] in existing else 0
+        products.append((
+            values["sku"], values["name"], categories[values["category"]].pk,
+            values["cost"], values["price"], values["reorder_level"], values["is_active"],
+            qty, qty <= values["reorder_level"], stamp, stamp,
+        ))
+
+    qn = connection.ops.quote_name
+    conflict = " ON CONFLICT ({}) DO UPDATE SET {}, {} = {}.{} <= excluded.{}".format(
+        qn("sku"),
+        ", ".join(f"{qn(c)} = excluded.{qn(c)}" for c in UPDATE_COLUMNS),
+        qn("is_low_stock"), qn(Product._meta.db_table), qn("quantity_on_hand"), qn("reorder_level"),
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # xmax is 0 on the rows the statement inserted; an updated row
+            # that wasn't locked above was inserted meanwhile, and its
+            # quantity and low-stock state weren't known here
+            returned = _insert(cursor, Product, PRODUCT_COLUMNS, products, conflict + " RETURNING id, sku, (xmax = 0)")
+            if any(not inserted and sku not in existing for _, sku, inserted in returned):
+                raise _Raced
+            ids = {sku: pk for pk, sku, _ in returned}
+            created = sum(1 for _, _, inserted in returned if inserted)
+        else:
+            # SQLite has one writer at a time: a SKU inserted since the
+            # SELECT fails the write (database is locked) instead
+            if connection.features.can_return_rows_from_bulk_insert:
+                ids = {sku: pk for pk, sku in _insert(cursor, Product, PRODUCT_COLUMNS, products, conflict + " RETURNING id, sku")}
+            else:
+                _insert(cursor, Product, PRODUCT_COLUMNS, products, conflict)
+                ids = dict(Product.objects.filter(sku__in=skus).values_list("sku", "pk"))
+            created = len(rows) - len(existing)
+
+        events, audits = [], []
+        for sku, name, _, _, _, reorder_level, _, qty, is_low, _, _ in products:
+            pk = ids[sku]
+            created = sku not in existing
+            # like Product.save(): a new product counts as "was not low"
+            was_low = not created and existing[sku][2]
+            if is_low != was_low:
+                events.append((pk, is_low, qty, reorder_level, stamp))
+            if audit:
+                action, verb = ("PRODUCT_CREATE", "Created") if created else ("PRODUCT_UPDATE", "Updated")
+                audits.append(entry(user, action, "Product", pk, f"{verb} {name} ({sku})"))
+
+        _insert(cursor, LowStockEvent, EVENT_COLUMNS, events)
+    log_many(audits)
+    return created, len(rows) - created
+
+
+def upsert_products(rows, user=None, chunk_size: int = CHUNK_SIZE, audit: bool = True) -> UpsertResult:
+    """
+    Creates or updates products from validated rows (see validate()) in one
+    transaction, `chunk_size` rows per statement. `audit=False` skips the
+    per-product audit entries (the caller logs a summary).
+    """
+    started = time.perf_counter()
+    created = updated = 0
+    now = timezone.now()
+    with transaction.atomic():
+        for i in range(0, len(rows), chunk_size):
+            while True:
+                try:
+                    with transaction.atomic():
+                        c, u = _upsert_chunk(rows[i:i + chunk_size], user, now, audit)
+                    break
+                except _Raced:
+                    # the savepoint dropped the chunk; its SELECT now sees the new rows
+                    continue
+            created += c
+            updated += u
+        # bulk_create sends no signals
+        bump("products")
+    return UpsertResult(created=created, updated=updated, elapsed=time.perf_counter() - started)
+
+
+def _write_rejected(writer, chunk, invalid):
+    for index, row, errors in invalid:
+        writer.writerow(dict(row, line=chunk[index][0], errors="; ".join(errors)))
+
+
+def _analyze():
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(Product._meta.db_table)}")
+
+
+def _import_chunk(chunk, writer, user, result) -> int:
+    valid, invalid = validate([row for _, row in chunk])
+    if invalid and writer is not None:
+        _write_rejected(writer, chunk, invalid)
+    if valid:
+        upserted = upsert_products(valid, user=user, chunk_size=len(valid), audit=False)
+        result.created += upserted.created
+        result.updated += upserted.updated
+        log(
+            user, "PRODUCT_IMPORT", "Catalog", 0,
+            f"Imported CSV lines {chunk[0][0]}-{chunk[-1][0]}: "
+            f"{upserted.created} created, {upserted.updated} updated, {len(invalid)} rejected",
+        )
+    result.rejected += len(invalid)
+    return len(chunk)
+
+
+def import_csv(lines, rejected=None, user=None, chunk_size: int = CHUNK_SIZE, progress=None) -> ImportResult:
+    """
+    Imports products from CSV text lines with a header row naming FIELDS
+    (category by name; extra columns are ignored).
+
+    Rows are read, validated and upserted `chunk_size` at a time; a chunk is
+    committed before the next one is read, so a failure keeps the chunks
+    already imported. Invalid rows are skipped and, if `rejected` (a text
+    file) is given, written to it as CSV with their line number and errors.
+    `progress(rows_read)` is called after each chunk.
+
+    Raises CatalogError if the header lacks a required column.
+    """
+    started = time.perf_counter()
+    reader = csv.DictReader(lines)
+    missing = [name for name in REQUIRED if name not in (reader.fieldnames or [])]
+    if missing:
+        raise CatalogError(f"Missing column(s): {', '.join(missing)}.")
+
+    writer = None
+    if rejected is not None:
+        writer = csv.DictWriter(rejected, ["line", *reader.fieldnames, "errors"], extrasaction="ignore")
+        writer.writeheader()
+
+    result = ImportResult(created=0, updated=0, elapsed=0.0)
+    # with statistics from when the table was small, the planner scans it
+    # for every chunk's SKU lookup instead of using the index
+    table_rows = Product.objects.count()
+    analyzed_at = 0
+    read = 0
+    chunk = []
+    for row in reader:
+        chunk.append((reader.line_num, row))
+        if len(chunk) < chunk_size:
+            continue
+        read += _import_chunk(chunk, writer, user, result)
+        chunk = []
+        added = result.created - analyzed_at
+        if added >= max(table_rows, ANALYZE_MIN_ROWS):
+            _analyze()
+            table_rows += added
+            analyzed_at = result.created
+        if progress:
+            progress(read)
+    if chunk:
+        read += _import_chunk(chunk, writer, user, result)
+        if progress:
+            progress(read)
+    if result.created - analyzed_at >= ANALYZE_MIN_ROWS:
+        _analyze()
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
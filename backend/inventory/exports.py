@@ -0,0 +1,204 @@
+"""
+Row generators for CSV exports.
+
+They read with values_list().iterator() (a server-side cursor on PostgreSQL)
+and yield one encoded CSV line at a time, so memory stays flat regardless of
+table size. Used by the streaming export views and the export_csv command.
+
+Each generator has an async twin (a...) reading through aiterator(), for the
+export views when served over ASGI: the download is then streamed by the
+event loop instead of holding a worker thread until the client has it all.
+The querysets use values_list(named=True): plain values_list() runs its
+query when the iterator is created, which aiterator() does on the event
+loop, where Django refuses it.
+"""
+import csv
+
+from asgiref.sync import sync_to_async
+
+from .models import InventoryTransaction, Product
+from .snapshots import as_of, starting_point
+
+CHUNK_SIZE = 2000
+
+PRODUCT_HEADER = [
+    "SKU", "Name", "Category", "Cost", "Price",
+    "Qty On Hand", "Reorder Level", "Active", "Created", "Updated"
+]
+
+TRANSACTION_HEADER = [
+    "Date", "Type", "SKU", "Product",
+    "Quantity", "Balance After", "Reference", "Note", "User"
+]
+
+STOCK_AS_OF_HEADER = ["SKU", "Name", "Category", "Qty On Hand", "As Of"]
+
+VALUATION_HEADER = [
+    "Category", "Products", "Qty On Hand",
+    "Standard Value", "FIFO Value", "Units At Current Cost"
+]
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _product_values():
+    return Product.objects.order_by("name").values_list(
+        "sku", "name", "category__name", "cost", "price",
+        "quantity_on_hand", "reorder_level", "is_active", "created_at", "updated_at",
+        named=True,
+    )
+
+
+def _product_line(sku, name, category, cost, price, qty, reorder, active, created, updated):
+    return [
+        sku,
+        name,
+        category,
+        f"{cost:.2f}",
+        f"{price:.2f}",
+        qty,
+        reorder,
+        "Yes" if active else "No",
+        created.isoformat(),
+        updated.isoformat(),
+    ]
+
+
+def product_csv_rows(chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    # header goes out before the query runs so clients get bytes right away
+    yield writer.writerow(PRODUCT_HEADER)
+
+    for row in _product_values().iterator(chunk_size=chunk_size):
+        yield writer.writerow(_product_line(*row))
+
+
+async def aproduct_csv_rows(chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(PRODUCT_HEADER)
+
+    async for row in _product_values().aiterator(chunk_size=chunk_size):
+        yield writer.writerow(_product_line(*row))
+
+
+def transaction_queryset(start=None, end=None):
+    qs = InventoryTransaction.objects.order_by("-created_at")
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        # include the entire end day by adding 1 day and using lt
+        qs = qs.filter(created_at__lt=end.replace(hour=23, minute=59, second=59))
+    return qs
+
+
+def _transaction_values(start, end):
+    return transaction_queryset(start, end).values_list(
+        "created_at", "transaction_type", "product__sku", "product__name",
+        "quantity", "balance_after", "reference", "note", "created_by__username",
+        named=True,
+    )
+
+
+def _transaction_line(created, tx_type, sku, name, qty, balance, reference, note, username):
+    return [
+        created.isoformat(),
+        tx_type,
+        sku,
+        name,
+        qty,
+        "" if balance is None else balance,
+        reference,
+        note,
+        username or "",
+    ]
+
+
+def transaction_csv_rows(start=None, end=None, chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(TRANSACTION_HEADER)
+
+    for row in _transaction_values(start, end).iterator(chunk_size=chunk_size):
+        yield writer.writerow(_transaction_line(*row))
+
+
+async def atransaction_csv_rows(start=None, end=None, chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(TRANSACTION_HEADER)
+
+    async for row in _transaction_values(start, end).aiterator(chunk_size=chunk_size):
+        yield writer.writerow(_transaction_line(*row))
+
+
+def _stock_values():
+    return Product.objects.order_by("name").values_list("pk", "sku", "name", "category__name", named=True)
+
+
+def _stock_lines(day, start, chunk):
+    # quantities for this chunk only, so memory doesn't grow with the catalog
+    quantities = as_of(day, [pk for pk, *_ in chunk], start)
+    return [[sku, name, category, quantities.get(pk, 0), day.isoformat()] for pk, sku, name, category in chunk]
+
+
+def stock_as_of_csv_rows(day, chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(STOCK_AS_OF_HEADER)
+
+    start = starting_point(day)
+    chunk = []
+    for row in _stock_values().iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            for line in _stock_lines(day, start, chunk):
+                yield writer.writerow(line)
+            chunk = []
+    for line in _stock_lines(day, start, chunk):
+        yield writer.writerow(line)
+
+
+async def astock_as_of_csv_rows(day, chunk_size: int = CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(STOCK_AS_OF_HEADER)
+
+    start = await sync_to_async(starting_point)(day)
+    chunk = []
+    async for row in _stock_values().aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            for line in await sync_to_async(_stock_lines)(day, start, chunk):
+                yield writer.writerow(line)
+            chunk = []
+    for line in await sync_to_async(_stock_lines)(day, start, chunk):
+        yield writer.writerow(line)
+
+
+def _valuation_lines(report):
+    for row in report["rows"] + [dict(report["totals"], category="Total")]:
+        yield [
+            row["category"],
+            row["products"],
+            row["units"],
+            f"{row['standard_value']:.2f}",
+            f"{row['fifo_value']:.2f}",
+            row["uncosted_units"],
+        ]
+
+
+def valuation_csv_rows(report):
+    writer = csv.writer(Echo())
+    yield writer.writerow(VALUATION_HEADER)
+
+    for line in _valuation_lines(report):
+        yield writer.writerow(line)
+
+
+async def avaluation_csv_rows(report):
+    writer = csv.writer(Echo())
+    yield writer.writerow(VALUATION_HEADER)
+
+    for line in _valuation_lines(report):
+        yield writer.writerow(line)
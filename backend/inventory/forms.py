@@ -2,6 +2,38 @@ from django import forms
 from .models import Product
 from .models import Category
 
+def product_rule_errors(cleaned):
+    """
+    (field, message) pairs for the cross-field product rules. Shared by
+    ProductForm and the bulk catalog upsert (inventory.catalog).
+    """
+    cost = cleaned.get("cost")
+    price = cleaned.get("price")
+    reorder = cleaned.get("reorder_level")
+    errors = []
+
+    if cost is not None and cost < 0:
+        errors.append(("cost", "Cost cannot be negative."))
+
+    if price is not None and price < 0:
+        errors.append(("price", "Price cannot be negative."))
+
+    if cost is not None and price is not None and price < cost:
+        errors.append(("price", "Price should usually be >= cost."))
+
+    if reorder is not None and reorder < 0:
+        errors.append(("reorder_level", "Reorder level cannot be negative."))
+
+    return errors
+
+
+def clean_category_name(name):
+    name = (name or "").strip()
+    if len(name) < 2:
+        raise forms.ValidationError("Category name must be at least 2 characters.")
+    return name
+
+
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
@@ -17,23 +49,22 @@ class ProductForm(forms.ModelForm):
 
     def clean(self):
         cleaned = super().clean()
-        cost = cleaned.get("cost")
-        price = cleaned.get("price")
-        reorder = cleaned.get("reorder_level")
-
-        if cost is not None and cost < 0:
-            self.add_error("cost", "Cost cannot be negative.")
-
-        if price is not None and price < 0:
-            self.add_error("price", "Price cannot be negative.")
-
-        if cost is not None and price is not None and price < cost:
-            self.add_error("price", "Price should usually be >= cost.")
+        for field, message in product_rule_errors(cleaned):
+            self.add_error(field, message)
+        return cleaned
 
-        if reorder is not None and reorder < 0:
-            self.add_error("reorder_level", "Reorder level cannot be negative.")
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV file",
+        help_text="Header row: sku,name,category,cost,price and optionally reorder_level,is_active. "
+                  "Existing SKUs are updated, categories are created by name.",
+    )
 
-        return cleaned
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith(".csv"):
+            raise forms.ValidationError("Upload a .csv file.")
+        return upload
 
 class CategoryForm(forms.ModelForm):
     class Meta:
@@ -41,7 +72,4 @@ class CategoryForm(forms.ModelForm):
         fields = ["name"]
 
     def clean_name(self):
-        name = (self.cleaned_data.get("name") or "").strip()
-        if len(name) < 2:
-            raise forms.ValidationError("Category name must be at least 2 characters.")
-        return name
\ No newline at end of file
+        return clean_category_name(self.cleaned_data.get("name"))
\ No newline at end of file
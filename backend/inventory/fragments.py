@@ -0,0 +1,55 @@
+"""
+HTMX partial responses for list pages.
+
+The results part of a list page (table and pager) is its own template,
+rendered to HTML once and embedded in the full page. Requests made by HTMX
+(filter changes, pager clicks, polling) get that fragment alone, without
+the layout or the filter form. On a history restore HTMX asks for the whole
+page, so those get it.
+
+The fragment is rendered without the request, so nothing user-specific can
+end up in it, and depends only on the query string and the data it shows.
+It is cached per query string under those data versions: a cache hit
+skips the queries as well as the rendering.
+"""
+import hashlib
+
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from .cache import cached
+
+
+def _variant(request) -> str:
+    # same filters in any order -> same key
+    params = sorted((k, v) for k, values in request.GET.lists() for v in values)
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+
+def results(request, name: str, template: str, depends_on, context) -> str:
+    """
+    `template` rendered with `context()`, cached as `name` per query string
+    until a namespace in `depends_on` changes.
+    """
+    return cached(
+        name,
+        depends_on,
+        lambda: render_to_string(template, context()),
+        variant=_variant(request),
+    )
+
+
+def respond(request, template: str, fragment: str, page_context=dict):
+    """
+    The fragment alone for HTMX requests, otherwise `template` with the
+    fragment as `results` plus `page_context()`.
+    """
+    if request.htmx and not request.htmx.history_restore_request:
+        response = HttpResponse(fragment)
+    else:
+        response = render(request, template, {**page_context(), "results": fragment})
+    # browsers and proxies must not answer one kind with the other
+    patch_vary_headers(response, ["HX-Request"])
+    return response
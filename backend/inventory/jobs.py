@@ -0,0 +1,288 @@
+"""
+DB-backed background jobs.
+
+Views queue an ExportJob row; `manage.py run_worker` claims pending rows with
+SELECT ... FOR UPDATE SKIP LOCKED and runs the handler registered for the
+job's kind outside the request cycle. Failed jobs are retried with backoff
+until `max_attempts`, and result files are removed once they expire.
+Exports read from a replica when one is configured (core.replicas).
+"""
+import io
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.replicas import replica_reads
+
+from . import valuation
+from .catalog import import_csv
+from .exports import product_csv_rows, transaction_csv_rows
+from .models import ExportJob, Product
+from .pdf import render_transactions_pdf, transaction_range
+
+# spill to disk once a result grows past this many bytes
+SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+RETRY_BACKOFF = timedelta(seconds=30)
+
+# a RUNNING job whose worker hasn't reported progress for this long is
+# assumed dead and handed to another worker
+STALE_AFTER = timedelta(minutes=10)
+
+# how often run_job refreshes a running job's heartbeat, whatever the handler
+# is doing (seed_demo, saving the result and ReportLab's final save() report
+# no progress)
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+
+FILENAMES = {
+    "TRANSACTIONS_PDF": "transactions.pdf",
+    "TRANSACTIONS_CSV": "transactions.csv",
+    "PRODUCTS_CSV": "products.csv",
+    "IMPORT_PRODUCTS": "rejected-rows.csv",
+}
+
+# kinds only admins may queue
+ADMIN_KINDS = {"SEED_DEMO", "IMPORT_PRODUCTS"}
+
+# kinds queued by their own view, with an uploaded file
+UPLOAD_KINDS = {"IMPORT_PRODUCTS"}
+
+# kinds the app queues itself, never from the export form
+SYSTEM_KINDS = UPLOAD_KINDS | {"VALUATION"}
+
+
+def _date_param(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def report_progress(job, done: int, total: int):
+    """Stores progress as a percentage and refreshes the job's heartbeat."""
+    pct = min(100, done * 100 // total) if total else 0
+    job.progress = pct
+    ExportJob.objects.filter(pk=job.pk).update(progress=pct, heartbeat_at=timezone.now())
+
+
+def _save_result(job, tmp):
+    tmp.seek(0)
+    job.result.save(f"{job.pk}-{FILENAMES[job.kind]}", File(tmp), save=False)
+
+
+def _write_csv(job, rows, total):
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b") as tmp:
+        for i, line in enumerate(rows):
+            tmp.write(line.encode("utf-8"))
+            if i and i % 5000 == 0:
+                report_progress(job, i, total)
+        _save_result(job, tmp)
+
+
+def transactions_pdf(job):
+    start = _date_param(job.params.get("start"))
+    end = _date_param(job.params.get("end"))
+
+    with replica_reads(), tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as tmp:
+        total = transaction_range(start, end).count()
+        render_transactions_pdf(tmp, start=start, end=end, progress=lambda done: report_progress(job, done, total))
+        _save_result(job, tmp)
+
+
+def transactions_csv(job):
+    start = _date_param(job.params.get("start"))
+    end = _date_param(job.params.get("end"))
+    with replica_reads():
+        total = transaction_range(start, end).count()
+        _write_csv(job, transaction_csv_rows(start, end), total)
+
+
+def products_csv(job):
+    with replica_reads():
+        _write_csv(job, product_csv_rows(), Product.objects.count())
+
+
+def seed_demo(job):
+    call_command("seed_demo")
+
+
+def import_products(job):
+    """
+    Streams the uploaded CSV (params["upload"], a default_storage name)
+    through catalog.import_csv. Rejected rows become the job's result file;
+    the counts are stored in params. The upload is deleted once imported.
+    A retry starts over, which is safe: rows are upserted by SKU.
+    """
+    name = job.params["upload"]
+    total = default_storage.size(name)
+
+    with default_storage.open(name, "rb") as upload, \
+            tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b") as tmp:
+        lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+        rejected = io.TextIOWrapper(tmp, encoding="utf-8", newline="")
+        result = import_csv(
+            lines,
+            rejected=rejected,
+            user=job.created_by,
+            progress=lambda rows: report_progress(job, upload.tell(), total),
+        )
+        rejected.flush()
+        if result.rejected:
+            _save_result(job, tmp)
+        rejected.detach()
+        lines.detach()
+
+    job.params.update(
+        created=result.created,
+        updated=result.updated,
+        rejected=result.rejected,
+        seconds=round(result.elapsed, 1),
+    )
+    default_storage.delete(name)
+
+
+def valuation_report(job):
+    """Computes the valuation report; the report pages serve the newest one (valuation.current())."""
+    with replica_reads():
+        job.params["report"] = valuation.to_params(valuation.compute())
+
+
+def _discard_upload(job):
+    """Deletes a job's uploaded file once the job has failed for good."""
+    if job.kind in UPLOAD_KINDS and job.params.get("upload"):
+        default_storage.delete(job.params["upload"])
+
+
+HANDLERS = {
+    "TRANSACTIONS_PDF": transactions_pdf,
+    "TRANSACTIONS_CSV": transactions_csv,
+    "PRODUCTS_CSV": products_csv,
+    "SEED_DEMO": seed_demo,
+    "IMPORT_PRODUCTS": import_products,
+    "VALUATION": valuation_report,
+}
+
+
+def enqueue(kind: str, user=None, **params) -> ExportJob:
+    return ExportJob.objects.create(kind=kind, params=params, created_by=user)
+
+
+def claim_next_job():
+    """
+    Marks the oldest runnable job RUNNING and returns it, or None.
+
+    SKIP LOCKED lets several workers poll the same table without ever
+    picking up the same row.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "RUNNING"
+        job.attempts += 1
+        job.progress = 0
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=["status", "attempts", "progress", "started_at", "heartbeat_at"])
+    return job
+
+
+@contextmanager
+def _heartbeat(job):
+    """Refreshes the job's heartbeat from a background thread while the block runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                try:
+                    ExportJob.objects.filter(pk=job.pk, status="RUNNING", attempts=job.attempts).update(
+                        heartbeat_at=timezone.now(),
+                    )
+                except DatabaseError:
+                    # e.g. SQLite busy; the next beat tries again
+                    pass
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    try:
+        with _heartbeat(job):
+            HANDLERS[job.kind](job)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = "PENDING"
+            job.run_after = timezone.now() + RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        else:
+            job.status = "FAILED"
+            job.finished_at = timezone.now()
+    else:
+        job.status = "DONE"
+        job.progress = 100
+        job.error = ""
+        job.finished_at = timezone.now()
+        if job.result:
+            job.expires_at = job.finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+
+    # only while this run still owns the job: requeue_stale_jobs() may have
+    # handed it to another worker, whose run is the one that counts now
+    saved = ExportJob.objects.filter(pk=job.pk, status="RUNNING", attempts=job.attempts).update(
+        status=job.status,
+        progress=job.progress,
+        params=job.params,
+        result=job.result.name,
+        error=job.error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+    )
+    if not saved:
+        if job.result:
+            job.result.delete(save=False)
+    elif job.status == "FAILED":
+        _discard_upload(job)
+    return job
+
+
+def requeue_stale_jobs() -> int:
+    now = timezone.now()
+    stale = ExportJob.objects.filter(status="RUNNING", heartbeat_at__lt=now - STALE_AFTER)
+    dead = stale.filter(attempts__gte=F("max_attempts"))
+    for job in dead.filter(kind__in=UPLOAD_KINDS):
+        _discard_upload(job)
+    dead.update(status="FAILED", error="Worker stopped responding.", finished_at=now)
+    return stale.update(status="PENDING")
+
+
+def expire_results() -> int:
+    """Deletes result files past their expiry time."""
+    expired = 0
+    for job in ExportJob.objects.filter(status="DONE", expires_at__lte=timezone.now()):
+        job.result.delete(save=False)
+        job.status = "EXPIRED"
+        job.save(update_fields=["result", "status"])
+        expired += 1
+    return expired
@@ -0,0 +1,64 @@
+"""
+Low-stock tracking.
+
+Product.is_low_stock mirrors quantity_on_hand <= reorder_level. The stock
+service updates it in the same UPDATE as the quantity and records a
+LowStockEvent whenever a product crosses its reorder level, so alerting only
+needs to read new events instead of scanning the catalog.
+"""
+from django.db.models import Case, F, Q, Value, When
+
+from .models import LowStockEvent, Product
+
+
+def low_after(delta: int):
+    """
+    UPDATE expression for is_low_stock once `delta` is added to the quantity.
+    SET expressions see the row's old values on PostgreSQL and SQLite.
+    """
+    return Case(
+        When(Q(quantity_on_hand__lte=F("reorder_level") - delta), then=Value(True)),
+        default=Value(False),
+    )
+
+
+def _transition(pk, qty, reorder, delta):
+    now_low = qty <= reorder
+    was_low = qty - delta <= reorder
+    if now_low == was_low:
+        return None
+    return LowStockEvent(product_id=pk, became_low=now_low, quantity_on_hand=qty, reorder_level=reorder)
+
+
+def record_transition(product, delta: int):
+    """
+    Records a LowStockEvent if `product` (refreshed after the UPDATE that
+    applied `delta`) crossed its reorder level. The row is still locked by
+    that UPDATE, so the state before it is (quantity - delta) <= reorder_level.
+    """
+    event = _transition(product.pk, product.quantity_on_hand, product.reorder_level, delta)
+    if event is not None:
+        event.save()
+    return event
+
+
+def record_transitions(deltas):
+    """
+    Batch version of record_transition for a {product pk: delta} mapping.
+    Returns {pk: quantity_on_hand} as read after the UPDATEs.
+    """
+    if not deltas:
+        return {}
+
+    rows = list(Product.objects.filter(pk__in=list(deltas)).values_list("pk", "quantity_on_hand", "reorder_level"))
+    events = [_transition(pk, qty, reorder, deltas[pk]) for pk, qty, reorder in rows]
+    LowStockEvent.objects.bulk_create([e for e in events if e is not None])
+    return {pk: qty for pk, qty, _ in rows}
+
+
+def feed(after_id: int = 0, limit: int = 100, only_low: bool = False):
+    """Events newer than `after_id`, oldest first, for polling consumers."""
+    qs = LowStockEvent.objects.select_related("product").filter(id__gt=after_id)
+    if only_low:
+        qs = qs.filter(became_low=True)
+    return list(qs.order_by("id")[:limit])
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory import archive
+
+
+class Command(BaseCommand):
+    help = "Move old audit rows into gzipped NDJSON files under AUDIT_ARCHIVE_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.AUDIT_RETENTION_DAYS,
+            help="Archive rows older than this many days (default: AUDIT_RETENTION_DAYS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be archived")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = archive.archive(older_than_days=options["days"], dry_run=True)
+            self.stdout.write(f"{count} audit rows are older than {options['days']} days.")
+            return
+
+        started = time.perf_counter()
+        moved = archive.archive(
+            older_than_days=options["days"],
+            batch_size=options["batch_size"],
+            progress=lambda n: self.stdout.write(f"  {n} rows archived", ending="\r"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} audit rows to {archive.archive_dir()} in {time.perf_counter() - started:.1f}s."
+        ))
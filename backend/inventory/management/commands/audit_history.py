@@ -0,0 +1,60 @@
+import json
+from datetime import datetime, time, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import archive
+from inventory.models import AuditLog
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Print audit history from the archive and the live table as NDJSON, oldest first"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", help="TYPE or TYPE:ID, e.g. Product:42")
+        parser.add_argument("--start", help="First UTC day (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Last UTC day (YYYY-MM-DD)")
+        parser.add_argument("--archived-only", action="store_true", help="Skip the live AuditLog table")
+
+    def handle(self, *args, **options):
+        entity_type = entity_id = None
+        if options["entity"]:
+            entity_type, _, raw_id = options["entity"].partition(":")
+            if raw_id:
+                try:
+                    entity_id = int(raw_id)
+                except ValueError:
+                    raise CommandError(f"Invalid entity id {raw_id!r}.")
+        start = _date(options["start"]) if options["start"] else None
+        end = _date(options["end"]) if options["end"] else None
+
+        for record in archive.scan(entity_type, entity_id, start, end):
+            self._write(record)
+
+        if options["archived_only"]:
+            return
+
+        qs = AuditLog.objects.order_by("created_at", "id")
+        if entity_type:
+            qs = qs.filter(entity_type=entity_type)
+        if entity_id is not None:
+            qs = qs.filter(entity_id=entity_id)
+        if start:
+            qs = qs.filter(created_at__gte=datetime.combine(start, time.min, tzinfo=timezone.utc))
+        if end:
+            qs = qs.filter(created_at__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc))
+
+        for row in qs.values(*archive.FIELDS).iterator(chunk_size=2000):
+            self._write(archive.to_record(row))
+
+    def _write(self, record):
+        if not isinstance(record["created_at"], str):
+            record["created_at"] = record["created_at"].isoformat()
+        self.stdout.write(json.dumps(record))
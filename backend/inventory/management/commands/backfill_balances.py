@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import balances
+
+
+class Command(BaseCommand):
+    help = "Fill in each stock movement's running balance (balance_after) from the ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=balances.CHUNK_SIZE, help="Products per transaction")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only list products whose newest balance doesn't match quantity_on_hand; fails if there are any",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drifted = list(balances.drift().values_list("sku", "quantity_on_hand", "last_balance")[:50])
+            for sku, on_hand, last in drifted:
+                self.stdout.write(f"  {sku}: on hand {on_hand}, newest balance_after {last}")
+            if drifted:
+                raise CommandError(f"{balances.drift().count()} product(s) out of balance.")
+            self.stdout.write(self.style.SUCCESS("All balances match quantity on hand."))
+            return
+
+        def progress(done, total):
+            if done == total or done % (options["chunk_size"] * 20) == 0:
+                self.stdout.write(f"  {done}/{total} products")
+
+        result = balances.backfill(chunk_size=options["chunk_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {result.updated} movements across {result.products} products "
+            f"in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
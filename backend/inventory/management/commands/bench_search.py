@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from inventory.models import Category, Product
+from inventory.search import search_products
+
+SKU_PREFIX = "BS-"
+
+ADJECTIVES = ["Steel", "Copper", "Plastic", "Wireless", "Organic", "Compact", "Heavy", "Premium", "Basic", "Eco"]
+NOUNS = ["Widget", "Cable", "Bracket", "Filter", "Bottle", "Adapter", "Sensor", "Panel", "Valve", "Hinge"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark product search: trigram index vs. sequential scan (PostgreSQL) or the plain fallback"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000_000, help="Benchmark products to ensure exist")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--query", action="append", dest="queries", help="Search term (repeatable)")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the benchmark products afterwards")
+
+    def handle(self, *args, **options):
+        self._ensure_products(options["products"])
+
+        queries = options["queries"] or ["steel", "BS-0000420", "BS-00004", "sensor 77", "no-such-thing"]
+        is_pg = connection.vendor == "postgresql"
+        modes = ["trigram index", "sequential scan"] if is_pg else ["fallback (no trigram index)"]
+
+        self.stdout.write(f"{'query':<20} {'mode':<28} {'rows':>6} {'median ms':>10} {'p95 ms':>8}")
+        for q in queries:
+            for mode in modes:
+                timings, rows = self._time_query(q, force_scan=(mode == "sequential scan"), repeat=options["repeat"])
+                p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(f"{q:<20} {mode:<28} {rows:>6} {statistics.median(timings):>10.2f} {p95:>8.2f}")
+
+        if options["cleanup"]:
+            deleted, _ = Product.objects.filter(sku__startswith=SKU_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} benchmark rows.")
+
+    def _ensure_products(self, target):
+        existing = Product.objects.filter(sku__startswith=SKU_PREFIX).count()
+        if existing >= target:
+            return
+
+        category, _ = Category.objects.get_or_create(name="Benchmark")
+        rng = random.Random(42)
+        self.stdout.write(f"Creating {target - existing} benchmark products...")
+        started = time.perf_counter()
+
+        batch = []
+        for i in range(existing, target):
+            qty = rng.randint(0, 100)
+            batch.append(Product(
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.randint(1, 999)}",
+                sku=f"{SKU_PREFIX}{i:07d}",
+                category=category,
+                cost=Decimal("1.00"),
+                price=Decimal("2.00"),
+                reorder_level=5,
+                quantity_on_hand=qty,
+                # bulk_create skips Product.save()
+                is_low_stock=qty <= 5,
+            ))
+            if len(batch) == 10_000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE inventory_product")
+        self.stdout.write(f"Created in {time.perf_counter() - started:.1f}s")
+
+    def _time_query(self, q, force_scan, repeat):
+        timings = []
+        rows = 0
+        for _ in range(repeat):
+            with transaction.atomic():
+                if force_scan:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL enable_bitmapscan = off")
+                        cursor.execute("SET LOCAL enable_indexscan = off")
+                qs = search_products(Product.objects.filter(is_active=True), q).order_by("search_rank", "name", "id")
+                started = time.perf_counter()
+                rows = len(list(qs[:10]))
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings, rows
@@ -0,0 +1,101 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from inventory.models import AuditLog, Category, Product
+from inventory.stock import InsufficientStock, apply_movement
+
+
+class Command(BaseCommand):
+    help = "Hammer one SKU with concurrent OUT movements and check stock stays consistent"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--ops", type=int, default=100, help="Movements attempted per thread")
+        parser.add_argument("--qty", type=int, default=1, help="Quantity per movement")
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Starting stock (default: half of what the threads try to take out, so some must fail)",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark product afterwards")
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        ops = options["ops"]
+        qty = options["qty"]
+        start_stock = options["stock"]
+        if start_stock is None:
+            start_stock = threads * ops * qty // 2
+
+        category, _ = Category.objects.get_or_create(name="Benchmark")
+        Product.objects.filter(sku="BENCH-STOCK").delete()
+        product = Product.objects.create(
+            name="Benchmark SKU",
+            sku="BENCH-STOCK",
+            category=category,
+            cost=Decimal("1.00"),
+            price=Decimal("2.00"),
+            quantity_on_hand=start_stock,
+        )
+
+        ok = []
+        rejected = []
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            local_ok = local_rejected = local_errors = 0
+            # each thread gets its own Product instance and DB connection
+            p = Product.objects.get(pk=product.pk)
+            barrier.wait()
+            try:
+                for _ in range(ops):
+                    try:
+                        apply_movement(p, "OUT", qty, reference="bench_stock")
+                        local_ok += 1
+                    except InsufficientStock:
+                        local_rejected += 1
+                    except OperationalError:
+                        # e.g. "database is locked" on SQLite
+                        local_errors += 1
+            finally:
+                connection.close()
+            ok.append(local_ok)
+            rejected.append(local_rejected)
+            errors.append(local_errors)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        succeeded = sum(ok)
+        ledger_out = product.transactions.filter(transaction_type="OUT").count()
+        expected = start_stock - succeeded * qty
+        attempted = threads * ops
+
+        self.stdout.write(f"threads={threads} ops/thread={ops} qty={qty} start_stock={start_stock}")
+        self.stdout.write(
+            f"succeeded={succeeded} rejected={sum(rejected)} errors={sum(errors)} "
+            f"final_stock={product.quantity_on_hand} expected={expected} ledger_out={ledger_out}"
+        )
+        self.stdout.write(f"elapsed={elapsed:.3f}s throughput={attempted / elapsed:.1f} movements/s")
+
+        consistent = product.quantity_on_hand == expected and ledger_out == succeeded
+
+        if not options["keep"]:
+            AuditLog.objects.filter(entity_type="Product", entity_id=product.pk).delete()
+            product.delete()
+
+        if not consistent:
+            raise CommandError("Stock is inconsistent with the ledger.")
+        self.stdout.write(self.style.SUCCESS("Stock is consistent."))
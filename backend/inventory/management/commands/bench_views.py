@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import InventoryTransaction
+from inventory.queryplans import make_client
+from inventory.viewbench import benchmark_job, compare, default_cases, route_names, run_case, to_json
+
+
+class Command(BaseCommand):
+    help = "Benchmark every view (latency, query count, SQL time) and enforce query budgets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="User to request the views as (default: first superuser)")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed requests per view")
+        parser.add_argument("--warm", action="store_true", help="Keep computed-result caches between requests")
+        parser.add_argument("--only", action="append", help="Only run cases for this route name (repeatable)")
+        parser.add_argument("--baseline", help="Compare against this baseline JSON")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Allowed p50 slowdown vs. the baseline")
+        parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+        parser.add_argument(
+            "--min-transactions",
+            type=int,
+            default=100_000,
+            help="Refuse to run on a smaller dataset, where timings say little",
+        )
+
+    def handle(self, *args, **options):
+        tx_count = InventoryTransaction.objects.count()
+        if tx_count < options["min_transactions"]:
+            raise CommandError(
+                f"Only {tx_count} transactions; seed a large dataset first (seed_scale) "
+                f"or lower --min-transactions."
+            )
+
+        User = get_user_model()
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No user to request the views as.")
+
+        client = make_client(user)
+        job = benchmark_job(user)
+        try:
+            cases = default_cases(job_id=job.pk)
+            missing = route_names() - {case.name for case in cases}
+            if missing:
+                raise CommandError(f"No benchmark case for: {', '.join(sorted(missing))}")
+            if options["only"]:
+                cases = [case for case in cases if case.name in options["only"]]
+
+            self.stdout.write(
+                f"{'view':<26} {'method':<6} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'sql ms':>8}  url"
+            )
+            results, failures = [], []
+            for case in cases:
+                try:
+                    result = run_case(client, case, repeat=options["repeat"], cold=not options["warm"])
+                except RuntimeError as exc:
+                    raise CommandError(f"{case.name}: {exc}")
+                results.append(result)
+
+                queries = f"{result.queries}/{result.query_budget}"
+                line = (
+                    f"{result.name:<26} {result.method:<6} {result.p50_ms:>8.1f} {result.p95_ms:>8.1f} "
+                    f"{queries:>8} {result.sql_ms:>8.1f}  {result.key.split(' ', 1)[1]}"
+                )
+                if result.over_budget:
+                    failures.append(f"{result.key}: {result.queries} queries, budget {case.query_budget}")
+                    line = self.style.ERROR(line)
+                self.stdout.write(line)
+        finally:
+            job.result.delete(save=False)
+            job.delete()
+
+        current = to_json(results)
+        if options["save_baseline"]:
+            Path(options["save_baseline"]).write_text(json.dumps(current, indent=2, sort_keys=True))
+            self.stdout.write(f"Baseline written to {options['save_baseline']}.")
+
+        if options["baseline"]:
+            try:
+                baseline = json.loads(Path(options["baseline"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Can't read baseline: {exc}")
+            failures += compare(current, baseline, options["threshold"])
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f"FAIL {failure}"))
+            raise CommandError(f"{len(failures)} benchmark check(s) failed.")
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} views within budget."))
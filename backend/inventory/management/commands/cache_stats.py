@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.cache import RESULTS, reset_stats, stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters for the computed-result cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'result':<24} {'hits':>8} {'misses':>8} {'hit ratio':>10}")
+        for name, (hits, misses) in stats(RESULTS).items():
+            total = hits + misses
+            ratio = f"{hits / total:.1%}" if total else "-"
+            self.stdout.write(f"{name:<24} {hits:>8} {misses:>8} {ratio:>10}")
+
+        if options["reset"]:
+            reset_stats(RESULTS)
+            self.stdout.write("Counters reset.")
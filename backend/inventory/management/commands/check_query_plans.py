@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory.models import InventoryTransaction, Product
+from inventory.queryplans import default_checks, make_client, run_check
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the main views' queries and fail on sequential scans of large tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="User to request the views as (default: first superuser)")
+        parser.add_argument(
+            "--min-transactions",
+            type=int,
+            default=100_000,
+            help="Refuse to run on a smaller dataset, where seq scans are the planner's right choice",
+        )
+
+    def handle(self, *args, **options):
+        tx_count = InventoryTransaction.objects.count()
+        if tx_count < options["min_transactions"]:
+            raise CommandError(
+                f"Only {tx_count} transactions; seed a large dataset first "
+                f"or lower --min-transactions."
+            )
+
+        User = get_user_model()
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No user to run the views as.")
+
+        client = make_client(user)
+
+        product = Product.objects.order_by("id").first()
+        failures = 0
+
+        for check in default_checks(product_id=product.pk if product else None):
+            if check.postgresql_only and connection.vendor != "postgresql":
+                self.stdout.write(f"SKIP {check.name} (needs PostgreSQL)")
+                continue
+
+            try:
+                violations = run_check(client, check)
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+            if not violations:
+                self.stdout.write(self.style.SUCCESS(f"OK   {check.name}"))
+                continue
+
+            failures += 1
+            self.stdout.write(self.style.ERROR(f"FAIL {check.name}"))
+            for table, sql in violations:
+                self.stdout.write(f"     seq scan on {table}: {sql[:300]}")
+
+        if failures:
+            raise CommandError(f"{failures} view(s) fall back to sequential scans.")
@@ -0,0 +1,40 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import make_aware
+
+from inventory.exports import product_csv_rows, transaction_csv_rows
+
+
+def _date(value):
+    try:
+        return make_aware(datetime.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Stream the products or transactions CSV export to a file or stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("report", choices=["products", "transactions"])
+        parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+        parser.add_argument("--start", help="Transactions from this date (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Transactions up to this date (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if options["report"] == "products":
+            rows = product_csv_rows(chunk_size=chunk_size)
+        else:
+            start = _date(options["start"]) if options["start"] else None
+            end = _date(options["end"]) if options["end"] else None
+            rows = transaction_csv_rows(start, end, chunk_size=chunk_size)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as f:
+                f.writelines(rows)
+        else:
+            sys.stdout.writelines(rows)
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.stock import BatchError, apply_movements, movements_from_csv
+
+
+class Command(BaseCommand):
+    help = "Import stock movements from a CSV file (sku,type,quantity,reference,note) as one batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a sku,type,quantity,reference,note header")
+        parser.add_argument("--user", help="Username recorded as created_by on the movements")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}.")
+
+        with open(options["path"], newline="", encoding="utf-8") as f:
+            movements = list(movements_from_csv(f))
+
+        try:
+            result = apply_movements(movements, user=user, chunk_size=options["chunk_size"])
+        except BatchError as exc:
+            for error in exc.errors:
+                self.stderr.write(error)
+            raise CommandError("Import aborted, no movements were applied.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows} movements for {result.products} products "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
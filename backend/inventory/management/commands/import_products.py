@@ -0,0 +1,72 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.catalog import CHUNK_SIZE, CatalogError, import_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV file "
+        "(sku,name,category,cost,price[,reorder_level][,is_active]), streamed in chunks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row")
+        parser.add_argument(
+            "--errors",
+            help="Where rejected rows are written (default: <path>.rejected.csv, removed if there are none)",
+        )
+        parser.add_argument("--user", help="Username recorded on the audit entries")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}.")
+
+        path = options["path"]
+        errors_path = options["errors"] or f"{os.path.splitext(path)[0]}.rejected.csv"
+
+        def progress(rows):
+            if rows % 50_000 < options["chunk_size"]:
+                self.stdout.write(f"  {rows} rows read")
+
+        try:
+            f = open(path, newline="", encoding="utf-8-sig")
+        except OSError as exc:
+            raise CommandError(f"Can't read {path}: {exc.strerror}.")
+
+        try:
+            with f, open(errors_path, "w", newline="", encoding="utf-8") as rejected:
+                result = import_csv(
+                    f,
+                    rejected=rejected,
+                    user=user,
+                    chunk_size=options["chunk_size"],
+                    progress=progress,
+                )
+        except CatalogError as exc:
+            os.remove(errors_path)
+            raise CommandError(str(exc))
+        except UnicodeDecodeError as exc:
+            os.remove(errors_path)
+            # chunks before the bad bytes are already committed; re-importing
+            # the fixed file updates them in place
+            raise CommandError(
+                f"{path} is not UTF-8 text ({exc.reason}); the products read before that point were imported."
+            )
+        if not result.rejected:
+            os.remove(errors_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} and updated {result.updated} products "
+            f"in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
+        if result.rejected:
+            self.stderr.write(f"{result.rejected} row(s) rejected, see {errors_path}.")
@@ -0,0 +1,28 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily movement rollup from the transaction ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days on or after this date (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"Invalid date {options['since']!r}, expected YYYY-MM-DD.")
+
+        started = time.perf_counter()
+        written = rollups.rebuild(since=since, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} rollup rows in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inventory.jobs import claim_next_job, expire_results, requeue_stale_jobs, run_job
+from inventory.snapshots import ensure_yesterday
+
+# how often an idle worker does housekeeping (stale jobs, expired files,
+# yesterday's stock snapshot)
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (reports, exports, maintenance)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit instead of polling")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait between polls when idle")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker started.")
+        last_maintenance = 0.0
+
+        while True:
+            close_old_connections()
+
+            if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                requeued = requeue_stale_jobs()
+                expired = expire_results()
+                if requeued or expired:
+                    self.stdout.write(f"Requeued {requeued} stale job(s), expired {expired} result(s).")
+                if ensure_yesterday():
+                    self.stdout.write("Took yesterday's stock snapshot.")
+                last_maintenance = time.monotonic()
+
+            job = claim_next_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            run_job(job)
+            self.stdout.write(f"{job} finished (attempt {job.attempts}/{job.max_attempts})")
+
+        self.stdout.write("Worker stopped.")
@@ -1,7 +1,9 @@
 import random
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from inventory.models import Category, Product, InventoryTransaction
+from inventory.audit import collect
+from inventory.models import Category, Product
+from inventory.stock import apply_movement
 
 class Command(BaseCommand):
     help = "Seed demo data for portfolio"
@@ -46,32 +48,15 @@ class Command(BaseCommand):
         User = get_user_model()
         actor = User.objects.order_by("id").first()
 
-        for p in created_products:
-            # stock in
-            qty_in = random.randint(10, 60)
-            InventoryTransaction.objects.create(
-                product=p,
-                transaction_type="IN",
-                quantity=qty_in,
-                reference="seed_demo",
-                note="Initial stock",
-                created_by=actor,
-            )
-            p.quantity_on_hand += qty_in
-
-            # some stock out
-            qty_out = random.randint(0, min(20, p.quantity_on_hand))
-            if qty_out > 0:
-                InventoryTransaction.objects.create(
-                    product=p,
-                    transaction_type="OUT",
-                    quantity=qty_out,
-                    reference="seed_demo",
-                    note="Sample sales",
-                    created_by=actor,
-                )
-                p.quantity_on_hand -= qty_out
+        with collect():
+            for p in created_products:
+                # stock in
+                qty_in = random.randint(10, 60)
+                apply_movement(p, "IN", qty_in, user=actor, reference="seed_demo", note="Initial stock")
 
-            p.save()
+                # some stock out
+                qty_out = random.randint(0, min(20, p.quantity_on_hand))
+                if qty_out > 0:
+                    apply_movement(p, "OUT", qty_out, user=actor, reference="seed_demo", note="Sample sales")
 
         self.stdout.write(self.style.SUCCESS("Demo data seeded successfully."))
\ No newline at end of file
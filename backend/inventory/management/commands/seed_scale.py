@@ -0,0 +1,62 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory import synthetic
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate a large, reproducible product catalog and transaction ledger for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--transactions", type=int, default=1_000_000)
+        parser.add_argument("--days", type=int, default=365, help="Days of history to spread the ledger over")
+        parser.add_argument("--end", help="Last day of history (YYYY-MM-DD, default today in TIME_ZONE)")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--sku-prefix", default="SS-", help="Prefix of the generated SKUs")
+        parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per INSERT/COPY transaction")
+
+    def handle(self, *args, **options):
+        if options["products"] < 1:
+            raise CommandError("--products must be at least 1.")
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+        if options["transactions"] < 0:
+            raise CommandError("--transactions can't be negative.")
+
+        end = timezone.localdate()
+        if options["end"]:
+            try:
+                end = datetime.strptime(options["end"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"Invalid date {options['end']!r}, expected YYYY-MM-DD.")
+
+        prefix = options["sku_prefix"]
+        if Product.objects.filter(sku__startswith=prefix).exists():
+            raise CommandError(f"Products with SKU prefix {prefix!r} already exist; pick another --sku-prefix.")
+
+        started = time.perf_counter()
+        timings = synthetic.generate(
+            products=options["products"],
+            transactions=options["transactions"],
+            days=options["days"],
+            seed=options["seed"],
+            end=end,
+            sku_prefix=prefix,
+            chunk_size=options["chunk_size"],
+            progress=lambda n: self.stdout.write(f"  {n} transactions written", ending="\r"),
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("")
+        for step, seconds in timings.items():
+            self.stdout.write(f"  {step:<14} {seconds:>8.1f}s")
+        rate = options["transactions"] / timings["transactions"] if timings["transactions"] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['products']} products and {options['transactions']} transactions "
+            f"in {elapsed:.1f}s ({rate:,.0f} transactions/s)."
+        ))
@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory import snapshots
+from inventory.models import StockSnapshot
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Store end-of-day stock snapshots used by the 'stock as of' report"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to snapshot (YYYY-MM-DD, default yesterday)")
+        parser.add_argument(
+            "--month-ends-since",
+            help="Also backfill month-end snapshots from this date (YYYY-MM-DD) that don't exist yet",
+        )
+        parser.add_argument(
+            "--keep-daily",
+            type=int,
+            help="Delete snapshots older than this many days, except month-end ones",
+        )
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        days = [_date(options["date"]) if options["date"] else yesterday]
+        if days[0] > yesterday:
+            raise CommandError("Only complete days (yesterday or earlier) can be snapshotted.")
+
+        if options["month_ends_since"]:
+            taken = set(StockSnapshot.objects.values_list("taken_on", flat=True).distinct())
+            days += [
+                d for d in snapshots.month_ends(_date(options["month_ends_since"]), yesterday)
+                if d not in taken and d not in days
+            ]
+
+        # newest first, so each older day can start from the one just taken
+        for day in sorted(days, reverse=True):
+            started = time.perf_counter()
+            written = snapshots.take(day)
+            self.stdout.write(f"{day}: {written} products in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        if options["keep_daily"] is not None:
+            deleted = snapshots.prune(options["keep_daily"])
+            self.stdout.write(f"Pruned {deleted} daily snapshot rows.")
+
+        self.stdout.write(self.style.SUCCESS("Snapshots up to date."))
@@ -0,0 +1,41 @@
+# Trigram indexes for product / transaction search (PostgreSQL only).
+#
+# Django compiles `field__icontains` to UPPER("field"::text) LIKE UPPER(%s) on
+# PostgreSQL, so the indexes are built on that exact expression with
+# gin_trgm_ops. Other databases skip this migration and keep scanning.
+
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ("inventory_product_name_trgm", "inventory_product", "name"),
+    ("inventory_product_sku_trgm", "inventory_product", "sku"),
+    ("inventory_tx_reference_trgm", "inventory_inventorytransaction", "reference"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_exportjob_progress_retries_expiry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
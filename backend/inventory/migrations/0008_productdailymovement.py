@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    InventoryTransaction = apps.get_model("inventory", "InventoryTransaction")
+    ProductDailyMovement = apps.get_model("inventory", "ProductDailyMovement")
+
+    daily = (
+        InventoryTransaction.objects.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("product_id", "day")
+        .annotate(
+            qty_in=Sum("quantity", filter=Q(transaction_type="IN"), default=0),
+            qty_out=Sum("quantity", filter=Q(transaction_type="OUT"), default=0),
+        )
+    )
+    batch = []
+    for row in daily.iterator(chunk_size=5000):
+        batch.append(ProductDailyMovement(**row))
+        if len(batch) == 5000:
+            ProductDailyMovement.objects.bulk_create(batch)
+            batch = []
+    ProductDailyMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_transaction_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDailyMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('qty_in', models.PositiveIntegerField(default=0)),
+                ('qty_out', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_movements', to='inventory.product')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='inventory_p_day_8dee99_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='uniq_daily_movement_product_day')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+def backfill_low_stock(apps, schema_editor):
+    Product = apps.get_model("inventory", "Product")
+    Product.objects.update(
+        is_low_stock=Case(
+            When(quantity_on_hand__lte=F("reorder_level"), then=Value(True)),
+            default=Value(False),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_productdailymovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('became_low', models.BooleanField()),
+                ('quantity_on_hand', models.PositiveIntegerField()),
+                ('reorder_level', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['name', 'id'], name='product_low_stock_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_low_stock', True)), fields=['quantity_on_hand', 'name'], name='product_low_stock_qty_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockevent',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_events', to='inventory.product'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_product_is_low_stock_lowstockevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_on', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.product')),
+            ],
+            options={
+                'ordering': ['-taken_on'],
+                'indexes': [models.Index(fields=['taken_on'], name='inventory_s_taken_o_275d2c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_on'), name='uniq_stock_snapshot_product_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stocksnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(condition=models.Q(('transaction_type', 'IN')), fields=['product', '-created_at', '-id'], name='tx_in_layers_idx'),
+        ),
+    ]
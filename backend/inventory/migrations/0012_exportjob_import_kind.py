@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_transaction_unit_cost'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('TRANSACTIONS_PDF', 'Transactions PDF'), ('TRANSACTIONS_CSV', 'Transactions CSV'), ('PRODUCTS_CSV', 'Products CSV'), ('SEED_DEMO', 'Seed demo data'), ('IMPORT_PRODUCTS', 'Product import')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_exportjob_import_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='balance_after',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_transaction_balance_after'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('PRODUCT_CREATE', 'Product Created'), ('PRODUCT_UPDATE', 'Product Updated'), ('PRODUCT_IMPORT', 'Products Imported'), ('STOCK_IN', 'Stock In'), ('STOCK_OUT', 'Stock Out')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_auditlog_event_time'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('TRANSACTIONS_PDF', 'Transactions PDF'), ('TRANSACTIONS_CSV', 'Transactions CSV'), ('PRODUCTS_CSV', 'Products CSV'), ('SEED_DEMO', 'Seed demo data'), ('IMPORT_PRODUCTS', 'Product import'), ('VALUATION', 'Inventory valuation')], max_length=50),
+        ),
+    ]
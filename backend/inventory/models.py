@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -25,6 +26,10 @@ class Product(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    # quantity_on_hand <= reorder_level, kept in sync by save() and the stock
+    # service so low-stock lookups can use a partial index
+    is_low_stock = models.BooleanField(default=False, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -33,11 +38,41 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=["sku"]),
             models.Index(fields=["name"]),
+            # product_list "low stock only"
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(is_low_stock=True),
+                name="product_low_stock_name_idx",
+            ),
+            # dashboard low-stock widget
+            models.Index(
+                fields=["quantity_on_hand", "name"],
+                condition=models.Q(is_active=True, is_low_stock=True),
+                name="product_low_stock_qty_idx",
+            ),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    def save(self, *args, **kwargs):
+        was_low = None if self._state.adding else self.is_low_stock
+        self.is_low_stock = self.quantity_on_hand <= self.reorder_level
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"is_low_stock"}
+
+        super().save(*args, **kwargs)
+
+        if self.is_low_stock != bool(was_low):
+            LowStockEvent.objects.create(
+                product=self,
+                became_low=self.is_low_stock,
+                quantity_on_hand=self.quantity_on_hand,
+                reorder_level=self.reorder_level,
+            )
+
 class InventoryTransaction(models.Model):
     TRANSACTION_TYPES = (
         ("IN", "Stock In"),
@@ -55,6 +90,16 @@ class InventoryTransaction(models.Model):
     reference = models.CharField(max_length=100, blank=True)
     note = models.TextField(blank=True)
 
+    # cost per unit of an IN movement (the product's cost at the time), for
+    # FIFO valuation; NULL on rows that predate it
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+
+    # the product's quantity_on_hand right after this movement, written with
+    # it by inventory.stock; NULL on rows that predate it until
+    # `manage.py backfill_balances`. A signed integer: inside one batch the
+    # stock service only checks the net movement, so a line may dip below 0.
+    balance_after = models.IntegerField(null=True, blank=True, editable=False)
+
     created_by = models.ForeignKey(
         "auth.User",
         on_delete=models.SET_NULL,
@@ -66,14 +111,69 @@ class InventoryTransaction(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # product_detail history, per-product reports
+            models.Index(fields=["product", "-created_at"]),
+            # transaction_list keyset pagination, date-range exports, dashboard movers
+            models.Index(fields=["-created_at", "-id"]),
+            # transaction_list / reports filtered by type
+            models.Index(fields=["transaction_type", "created_at"]),
+            # FIFO valuation walks each product's receipts newest first
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                condition=models.Q(transaction_type="IN"),
+                name="tx_in_layers_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.product.name} ({self.quantity})"
 
+class ProductDailyMovement(models.Model):
+    """Per-product, per-day IN/OUT totals, kept in step with the ledger by inventory.stock."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_movements")
+    day = models.DateField()
+    qty_in = models.PositiveIntegerField(default=0)
+    qty_out = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "day"], name="uniq_daily_movement_product_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.day}: +{self.qty_in} -{self.qty_out}"
+
+class StockSnapshot(models.Model):
+    """A product's quantity on hand at the end of a (local) day."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="snapshots")
+    taken_on = models.DateField()
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-taken_on"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "taken_on"], name="uniq_stock_snapshot_product_day"),
+        ]
+        indexes = [
+            models.Index(fields=["taken_on"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.taken_on}: {self.quantity}"
+
 class AuditLog(models.Model):
     ACTIONS = (
         ("PRODUCT_CREATE", "Product Created"),
         ("PRODUCT_UPDATE", "Product Updated"),
+        ("PRODUCT_IMPORT", "Products Imported"),
         ("STOCK_IN", "Stock In"),
         ("STOCK_OUT", "Stock Out"),
     )
@@ -83,10 +183,78 @@ class AuditLog(models.Model):
     entity_type = models.CharField(max_length=50)
     entity_id = models.IntegerField()
     message = models.CharField(max_length=255, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # when the event happened, set by audit.entry(); the row itself may be
+    # written later, by the request's flush or the AUDIT_ASYNC thread
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at"]),
+            models.Index(fields=["entity_type", "entity_id"]),
+        ]
 
     def __str__(self):
         return f"{self.action} {self.entity_type}#{self.entity_id}"
+
+class ExportJob(models.Model):
+    KINDS = (
+        ("TRANSACTIONS_PDF", "Transactions PDF"),
+        ("TRANSACTIONS_CSV", "Transactions CSV"),
+        ("PRODUCTS_CSV", "Products CSV"),
+        ("SEED_DEMO", "Seed demo data"),
+        ("IMPORT_PRODUCTS", "Product import"),
+        ("VALUATION", "Inventory valuation"),
+    )
+    STATUSES = (
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+        ("EXPIRED", "Expired"),
+    )
+
+    kind = models.CharField(max_length=50, choices=KINDS)
+    status = models.CharField(max_length=10, choices=STATUSES, default="PENDING")
+    params = models.JSONField(default=dict, blank=True)
+    result = models.FileField(upload_to="exports/", blank=True)
+    error = models.TextField(blank=True)
+
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+
+    created_by = models.ForeignKey("auth.User", on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["status", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class LowStockEvent(models.Model):
+    """A product crossing its reorder level, in either direction."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="low_stock_events")
+    became_low = models.BooleanField()
+    quantity_on_hand = models.PositiveIntegerField()
+    reorder_level = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self):
+        state = "low" if self.became_low else "restocked"
+        return f"{self.product_id} {state} ({self.quantity_on_hand}/{self.reorder_level})"
@@ -0,0 +1,148 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with a WHERE on the sort key of the last row seen instead of
+OFFSET, and no COUNT(*) is run, so every page costs about the same no matter
+how deep it is. Cursors are opaque url-safe tokens.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None, approx_total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.approx_total = approx_total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values, direction: str) -> str:
+    payload = json.dumps({"v": values, "d": direction}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Returns (values, direction) or (None, None) for a missing/garbled token."""
+    if not token:
+        return None, None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = data["v"], data["d"]
+    except (ValueError, KeyError, TypeError):
+        return None, None
+    if direction not in ("n", "p") or not isinstance(values, list):
+        return None, None
+    return values, direction
+
+
+def _after(keys, values, reverse=False):
+    """
+    Builds the "comes after (values)" filter for the ordering `keys`, a list
+    of (field, descending) pairs, e.g.
+    (created_at < a) OR (created_at = a AND id < b) for descending keys.
+    """
+    condition = Q()
+    equal = {}
+    for (field, descending), value in zip(keys, values):
+        op = "lt" if descending != reverse else "gt"
+        condition |= Q(**equal, **{f"{field}__{op}": value})
+        equal[field] = value
+    return condition
+
+
+def approximate_count(qs):
+    """
+    Row estimate from the PostgreSQL planner (no table scan).
+    Returns None on other databases.
+    """
+    if connections[qs.db].vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(qs.order_by().explain(format="json"))
+    except Exception:
+        return None
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _to_python(model, field, value):
+    try:
+        return model._meta.get_field(field).to_python(value)
+    except FieldDoesNotExist:
+        # annotation (e.g. a search rank); JSON already gives the right type
+        return value
+
+
+def keyset_paginate(qs, keys, cursor: str = "", per_page: int = 15, approx_total: bool = False) -> KeysetPage:
+    """
+    Paginates `qs` by `keys`, a list of (field, descending) pairs that must
+    end in a unique field (normally "id"). `qs` may be a values() queryset
+    that includes the key fields.
+    """
+    model = qs.model
+    values, direction = decode_cursor(cursor)
+
+    if values is not None and len(values) == len(keys):
+        try:
+            values = [_to_python(model, f, v) for (f, _), v in zip(keys, values)]
+        except Exception:
+            values, direction = None, None
+    else:
+        values, direction = None, None
+
+    backwards = direction == "p"
+    ordering = [
+        f"-{f}" if descending != backwards else f
+        for f, descending in keys
+    ]
+
+    page_qs = qs.order_by(*ordering)
+    if values is not None:
+        page_qs = page_qs.filter(_after(keys, values, reverse=backwards))
+
+    rows = list(page_qs[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def key_of(obj):
+        if isinstance(obj, dict):
+            # values() rows
+            return [obj[f] for f, _ in keys]
+        return [getattr(obj, f) for f, _ in keys]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        has_next = more if not backwards else True
+        has_prev = more if backwards else values is not None
+        if has_next:
+            next_cursor = encode_cursor(key_of(rows[-1]), "n")
+        if has_prev:
+            prev_cursor = encode_cursor(key_of(rows[0]), "p")
+
+    return KeysetPage(
+        rows,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        approx_total=approximate_count(qs) if approx_total else None,
+    )
@@ -0,0 +1,90 @@
+"""
+ReportLab rendering for the transactions PDF.
+
+Rows are read from the DB in chunks and drawn page by page straight onto the
+given file object; nothing holds the full result set in memory.
+"""
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .exports import CHUNK_SIZE
+from .models import InventoryTransaction
+
+
+def transaction_range(start=None, end=None):
+    qs = InventoryTransaction.objects.order_by("-created_at")
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lte=end.replace(hour=23, minute=59, second=59))
+    return qs
+
+
+def _draw_headers(c, y):
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(50, y, "Date")
+    c.drawString(150, y, "Type")
+    c.drawString(200, y, "SKU")
+    c.drawString(280, y, "Product")
+    c.drawString(470, y, "Qty")
+    c.drawString(515, y, "Balance")
+    c.setFont("Helvetica", 9)
+    return y - 15
+
+
+def render_transactions_pdf(fileobj, start=None, end=None, chunk_size: int = CHUNK_SIZE, progress=None):
+    """
+    Writes the transactions report for the optional [start, end] range to
+    `fileobj` and returns the number of rows drawn.
+
+    `progress`, if given, is called with the running row count after every
+    chunk.
+    """
+    rows = transaction_range(start, end).values_list(
+        "created_at", "transaction_type", "product__sku", "product__name", "quantity", "balance_after"
+    )
+
+    # pageCompression keeps finished pages small until save() writes them out
+    c = canvas.Canvas(fileobj, pagesize=letter, pageCompression=1)
+    width, height = letter
+
+    y = height - 50
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, y, "Inventory Transactions Report")
+    y -= 20
+
+    c.setFont("Helvetica", 10)
+    date_line = "All time"
+    if start and end:
+        date_line = f"From {start.date()} to {end.date()}"
+    elif start:
+        date_line = f"From {start.date()}"
+    elif end:
+        date_line = f"Up to {end.date()}"
+
+    c.drawString(50, y, date_line)
+    y -= 25
+
+    y = _draw_headers(c, y)
+
+    count = 0
+    for created, tx_type, sku, name, qty, balance in rows.iterator(chunk_size=chunk_size):
+        if y < 60:
+            c.showPage()
+            y = _draw_headers(c, height - 50)
+
+        c.drawString(50, y, created.strftime("%Y-%m-%d"))
+        c.drawString(150, y, tx_type)
+        c.drawString(200, y, sku[:12])
+        c.drawString(280, y, name[:30])
+        c.drawRightString(495, y, str(qty))
+        if balance is not None:
+            c.drawRightString(555, y, str(balance))
+        y -= 14
+        count += 1
+        if progress and count % chunk_size == 0:
+            progress(count)
+
+    c.showPage()
+    c.save()
+    return count
@@ -0,0 +1,125 @@
+"""
+Query-plan checks for the main views.
+
+Each check requests a URL through the Django test client, captures the SQL
+it runs and EXPLAINs every SELECT that touches one of the large tables. A
+check fails if the plan falls back to a sequential scan of such a table.
+Run it against a large seeded dataset with fresh statistics (ANALYZE): on
+tiny or unanalyzed tables the planner prefers sequential scans no matter
+which indexes exist.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .cache import invalidate_all
+
+LARGE_TABLES = (
+    "inventory_product",
+    "inventory_inventorytransaction",
+    "inventory_auditlog",
+    "inventory_productdailymovement",
+)
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    url: str
+    # tables this view is allowed to scan, with the reason
+    allow_scans: dict = field(default_factory=dict)
+    # substring search can only use an index through pg_trgm
+    postgresql_only: bool = False
+
+
+def default_checks(product_id=None):
+    checks = [
+        PlanCheck("dashboard", "/"),
+        PlanCheck("product_list low stock", "/products/?low_stock=1&active=all"),
+        PlanCheck("product_list", "/products/"),
+        PlanCheck("product_list search", "/products/?q=widget", postgresql_only=True),
+        PlanCheck("transaction_list", "/transactions/"),
+        PlanCheck("transaction_list by type", "/transactions/?type=OUT"),
+        PlanCheck("transaction_list by date", "/transactions/?start=2024-01-01&end=2024-01-31"),
+        PlanCheck("transaction_list search", "/transactions/?q=widget", postgresql_only=True),
+        PlanCheck("audit_list", "/audit/"),
+        PlanCheck(
+            "category_list",
+            "/categories/",
+            allow_scans={"inventory_product": "counts every product per category"},
+        ),
+    ]
+    if product_id is not None:
+        checks.append(PlanCheck("product_detail", f"/products/{product_id}/"))
+    return checks
+
+
+def make_client(user):
+    """Logged-in test client that passes ALLOWED_HOSTS outside the test runner."""
+    hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h and h != "*"]
+    client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+    client.force_login(user)
+    return client
+
+
+def explain(sql: str):
+    """Returns the plan lines for `sql` (already interpolated) on the default DB."""
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        rows = cursor.fetchall()
+    if connection.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def sequential_scans(plan_lines):
+    """Names of tables the plan reads with a full sequential scan."""
+    tables = set()
+    # SQLite: "SCAN t USING INDEX i" walks the index in order and stops at the
+    # LIMIT, unless rows still have to be sorted afterwards
+    sorts = any("USE TEMP B-TREE" in line for line in plan_lines)
+    for line in plan_lines:
+        if connection.vendor == "sqlite":
+            m = re.match(r"\s*SCAN (?:TABLE )?(\w+)", line)
+            if m and "USING" in line and not sorts:
+                m = None
+        else:
+            m = re.search(r"(?:Parallel )?Seq Scan on (\w+)", line)
+        if m:
+            tables.add(m.group(1))
+    return tables
+
+
+def run_check(client, check: PlanCheck):
+    """
+    Requests `check.url` and returns a list of (table, sql) sequential scans
+    on large tables that the check doesn't allow.
+    """
+    # cached results would hide the queries we want to look at
+    invalidate_all()
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(check.url)
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"{check.name}: GET {check.url} returned {response.status_code}")
+
+    violations = []
+    for query in ctx.captured_queries:
+        sql = query["sql"]
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+        if not any(table in sql for table in LARGE_TABLES):
+            continue
+        for table in sequential_scans(explain(sql)):
+            if table in LARGE_TABLES and table not in check.allow_scans:
+                violations.append((table, sql))
+    return violations
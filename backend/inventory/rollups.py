@@ -0,0 +1,141 @@
+"""
+Daily movement rollup (ProductDailyMovement).
+
+The stock service calls record() inside the same transaction as each ledger
+write, so the rollup never drifts from InventoryTransaction. rebuild()
+recomputes it from the ledger for backfills and repairs, locking the
+products it is working on so it can't race record().
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from .models import InventoryTransaction, Product, ProductDailyMovement
+
+CHUNK_SIZE = 500
+
+# products rebuilt per transaction (their movements wait meanwhile)
+PRODUCTS_PER_REBUILD = 1000
+
+
+def record(transactions):
+    """
+    Adds saved InventoryTransaction rows to the rollup.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE with increments (same syntax on
+    PostgreSQL and SQLite), so concurrent movements on the same product/day
+    can't lose updates.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for tx in transactions:
+        key = (tx.product_id, timezone.localdate(tx.created_at))
+        totals[key][0 if tx.transaction_type == "IN" else 1] += tx.quantity
+
+    if not totals:
+        return
+
+    table = ProductDailyMovement._meta.db_table
+    # sorted so concurrent batches take row locks in the same order
+    rows = sorted(totals.items())
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[i:i + CHUNK_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for (product_id, day), (qty_in, qty_out) in chunk:
+                params += [product_id, day, qty_in, qty_out]
+            cursor.execute(
+                f"INSERT INTO {table} (product_id, day, qty_in, qty_out) VALUES {placeholders} "
+                f"ON CONFLICT (product_id, day) DO UPDATE SET "
+                f"qty_in = {table}.qty_in + excluded.qty_in, "
+                f"qty_out = {table}.qty_out + excluded.qty_out",
+                params,
+            )
+
+
+def rebuild(since=None, chunk_size: int = 5000) -> int:
+    """
+    Recomputes the rollup from the ledger for days >= `since` (all days if
+    None). Returns the number of rollup rows written.
+
+    Works through the products PRODUCTS_PER_REBUILD at a time, each batch in
+    its own transaction with its products locked first (in pk order, like
+    the stock service). A movement on those products either committed
+    before the lock, and is in the ledger being summed, or waits for the
+    batch and then adds to the rebuilt rows with record().
+    """
+    ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+    written = 0
+    for i in range(0, len(ids), PRODUCTS_PER_REBUILD):
+        lo, hi = ids[i], ids[min(i + PRODUCTS_PER_REBUILD, len(ids)) - 1]
+        with transaction.atomic():
+            list(Product.objects.select_for_update().filter(pk__range=(lo, hi)).order_by("pk").values_list("pk"))
+            written += _rebuild_products(lo, hi, since, chunk_size)
+    return written
+
+
+def _rebuild_products(lo, hi, since, chunk_size):
+    ledger = InventoryTransaction.objects.filter(product_id__gte=lo, product_id__lte=hi)
+    rollups = ProductDailyMovement.objects.filter(product_id__gte=lo, product_id__lte=hi)
+    if since:
+        ledger = ledger.filter(created_at__gte=make_aware(datetime.combine(since, time.min)))
+        rollups = rollups.filter(day__gte=since)
+
+    daily = (
+        ledger.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("product_id", "day")
+        .annotate(
+            qty_in=Sum("quantity", filter=Q(transaction_type="IN"), default=0),
+            qty_out=Sum("quantity", filter=Q(transaction_type="OUT"), default=0),
+        )
+    )
+
+    rollups.delete()
+    written = 0
+    batch = []
+    for row in daily.iterator(chunk_size=chunk_size):
+        batch.append(ProductDailyMovement(**row))
+        if len(batch) == chunk_size:
+            ProductDailyMovement.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        ProductDailyMovement.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def top_movers(days: int = 30, limit: int = 10):
+    """Products with the most units moved (IN + OUT) over the last `days` days."""
+    since = timezone.localdate() - timedelta(days=days)
+    # aggregate on the rollup alone, then look up names for the top rows only;
+    # grouping across the product join invites a scan of the product table
+    top = list(
+        ProductDailyMovement.objects.filter(day__gte=since)
+        .values("product_id")
+        .annotate(moved_qty=Sum(F("qty_in") + F("qty_out")))
+        .order_by("-moved_qty")[:limit]
+    )
+    products = Product.objects.in_bulk([row["product_id"] for row in top])
+    for row in top:
+        product = products.get(row["product_id"])
+        row["product__name"] = product.name if product else ""
+        row["product__sku"] = product.sku if product else ""
+    return top
+
+
+def daily_totals(days: int = 30):
+    """Units in/out per day across all products over the last `days` days."""
+    since = timezone.localdate() - timedelta(days=days)
+    return (
+        ProductDailyMovement.objects.filter(day__gte=since)
+        .values("day")
+        .annotate(qty_in=Sum("qty_in"), qty_out=Sum("qty_out"))
+        .order_by("-day")
+    )
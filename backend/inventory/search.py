@@ -0,0 +1,35 @@
+"""
+Product / transaction search.
+
+Matching stays a case-insensitive substring match (icontains) on every
+database. On PostgreSQL, migration 0006 adds pg_trgm GIN indexes on
+UPPER(name), UPPER(sku) and UPPER(reference), which is exactly the
+expression Django's icontains compiles to, so the search becomes a bitmap
+index scan instead of a sequential scan. SQLite simply scans as before.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Product
+
+
+def rank_products(q: str):
+    """Exact SKU first, then SKU prefix, then name prefix, then the rest."""
+    return Case(
+        When(sku__iexact=q, then=Value(0)),
+        When(sku__istartswith=q, then=Value(1)),
+        When(name__istartswith=q, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )
+
+
+def search_products(qs, q: str):
+    """Filters `qs` to products matching `q` and annotates `search_rank`."""
+    return qs.filter(Q(name__icontains=q) | Q(sku__icontains=q)).annotate(search_rank=rank_products(q))
+
+
+def search_transactions(qs, q: str):
+    # match products in a subquery so each side can use its own index
+    # instead of OR-ing ILIKEs across the join
+    matching_products = Product.objects.filter(Q(name__icontains=q) | Q(sku__icontains=q)).values("pk")
+    return qs.filter(Q(product__in=matching_products) | Q(reference__icontains=q))
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump
+from .models import Category, InventoryTransaction, Product
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, **kwargs):
+    bump("products")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, **kwargs):
+    bump("categories")
+
+
+@receiver([post_save, post_delete], sender=InventoryTransaction)
+def transaction_changed(sender, **kwargs):
+    bump("transactions")
@@ -0,0 +1,167 @@
+"""
+Point-in-time stock ("stock as of a date").
+
+StockSnapshot rows hold every product's quantity at the end of a day. To
+answer "how much did we have at the end of day D", as_of() starts from the
+nearest known state and applies the daily rollup (ProductDailyMovement)
+between it and D:
+
+- the latest snapshot on or before D, plus the movements after it;
+- the earliest snapshot after D, minus the movements after D;
+- or the live quantity_on_hand, minus every movement after D.
+
+Whichever is closest to D wins, so the work is bounded by the number of
+days to the nearest snapshot rather than by the size of the ledger. All
+days are local (TIME_ZONE) days, like the rollup.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.utils import timezone
+
+from .models import Product, ProductDailyMovement, StockSnapshot
+
+CHUNK_SIZE = 2000
+
+
+def starting_point(day):
+    """(kind, anchor day) of the closest known state to the end of `day`."""
+    today = timezone.localdate()
+    candidates = [("live", today)]
+
+    before = StockSnapshot.objects.filter(taken_on__lte=day).aggregate(d=Max("taken_on"))["d"]
+    if before is not None:
+        candidates.append(("before", before))
+    after = StockSnapshot.objects.filter(taken_on__gt=day, taken_on__lt=today).aggregate(d=Min("taken_on"))["d"]
+    if after is not None:
+        candidates.append(("after", after))
+
+    return min(candidates, key=lambda c: abs((c[1] - day).days))
+
+
+def _net(first_day, last_day, product_ids=None):
+    """Net movement (in - out) per product over first_day..last_day."""
+    qs = ProductDailyMovement.objects.filter(day__gte=first_day)
+    if last_day is not None:
+        qs = qs.filter(day__lte=last_day)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    return dict(
+        qs.values("product_id")
+        .annotate(net=Sum(F("qty_in") - F("qty_out")))
+        .values_list("product_id", "net")
+    )
+
+
+def as_of(day, product_ids=None, start=None) -> dict:
+    """
+    Quantity on hand per product id at the end of `day` (limited to
+    `product_ids` if given). Products missing from the result had none.
+
+    Callers that look the catalog up chunk by chunk pass the same `start`
+    (from starting_point(day)) for every chunk, so all chunks are computed
+    from the same state.
+    """
+    if product_ids is not None:
+        product_ids = list(product_ids)
+
+    kind, anchor = start or starting_point(day)
+
+    if kind == "before":
+        base = StockSnapshot.objects.filter(taken_on=anchor)
+        if product_ids is not None:
+            base = base.filter(product_id__in=product_ids)
+        quantities = defaultdict(int, base.values_list("product_id", "quantity"))
+        for pk, net in _net(anchor + timedelta(days=1), day, product_ids).items():
+            quantities[pk] += net
+    else:
+        if kind == "live":
+            base = Product.objects.all()
+            if product_ids is not None:
+                base = base.filter(pk__in=product_ids)
+            quantities = defaultdict(int, base.values_list("pk", "quantity_on_hand"))
+            net = _net(day + timedelta(days=1), None, product_ids)
+        else:
+            base = StockSnapshot.objects.filter(taken_on=anchor)
+            if product_ids is not None:
+                base = base.filter(product_id__in=product_ids)
+            quantities = defaultdict(int, base.values_list("product_id", "quantity"))
+            net = _net(day + timedelta(days=1), anchor, product_ids)
+        for pk, moved in net.items():
+            quantities[pk] -= moved
+
+    return dict(quantities)
+
+
+def take(day=None) -> int:
+    """
+    Stores every product's quantity at the end of `day` (default:
+    yesterday, the last complete day). Re-taking a day overwrites it.
+    Returns the number of rows written.
+    """
+    today = timezone.localdate()
+    day = day or today - timedelta(days=1)
+    if day >= today:
+        raise ValueError("Only complete days can be snapshotted.")
+
+    # CHUNK_SIZE products at a time (keyset on pk), so memory doesn't grow
+    # with the catalog. One transaction: as_of() must never start from a
+    # half-written snapshot, including this one's own first chunks.
+    start = starting_point(day)
+    written = 0
+    last_pk = 0
+    with transaction.atomic():
+        while True:
+            ids = list(Product.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:CHUNK_SIZE])
+            if not ids:
+                return written
+            quantities = as_of(day, ids, start)
+            StockSnapshot.objects.bulk_create(
+                [StockSnapshot(product_id=pk, taken_on=day, quantity=quantities.get(pk, 0)) for pk in ids],
+                update_conflicts=True,
+                unique_fields=["product", "taken_on"],
+                update_fields=["quantity"],
+            )
+            written += len(ids)
+            last_pk = ids[-1]
+
+
+def ensure_yesterday() -> int:
+    """Takes yesterday's snapshot unless it exists (worker housekeeping)."""
+    yesterday = timezone.localdate() - timedelta(days=1)
+    if StockSnapshot.objects.filter(taken_on=yesterday).exists():
+        return 0
+    return take(yesterday)
+
+
+def month_ends(since, until):
+    """Last day of every month between `since` and `until` (inclusive)."""
+    day = since.replace(day=1)
+    while True:
+        next_month = (day + timedelta(days=32)).replace(day=1)
+        end = next_month - timedelta(days=1)
+        if end > until:
+            return
+        if end >= since:
+            yield end
+        day = next_month
+
+
+def prune(keep_daily_days: int) -> int:
+    """
+    Deletes snapshots older than `keep_daily_days` days except month-end
+    ones. Returns the number of rows deleted.
+    """
+    cutoff = timezone.localdate() - timedelta(days=keep_daily_days)
+    old_days = (
+        StockSnapshot.objects.filter(taken_on__lt=cutoff)
+        .values_list("taken_on", flat=True)
+        .distinct()
+    )
+    doomed = [d for d in old_days if (d + timedelta(days=1)).day != 1]
+    if not doomed:
+        return 0
+    deleted, _ = StockSnapshot.objects.filter(taken_on__in=doomed).delete()
+    return deleted
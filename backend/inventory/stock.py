@@ -0,0 +1,228 @@
+"""
+Stock mutation service.
+
+Every code path that moves stock goes through here. The quantity change is a
+single conditional UPDATE (no read-modify-write in Python), so concurrent
+OUT movements on the same SKU can never lose updates or oversell.
+"""
+import csv
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import rollups
+from .audit import entry, log, log_many
+from .cache import bump
+from .lowstock import low_after, record_transition, record_transitions
+from .models import InventoryTransaction, Product
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+class BatchError(Exception):
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid movement(s)")
+        self.errors = errors
+
+
+@dataclass
+class BatchResult:
+    rows: int
+    products: int
+    elapsed: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def apply_movement(product, transaction_type: str, quantity: int, user=None, reference: str = "", note: str = ""):
+    """
+    Applies an IN/OUT movement to `product` and writes the ledger + audit rows
+    in the same database transaction.
+
+    Raises InsufficientStock if an OUT movement would take stock below zero.
+    Returns the saved InventoryTransaction; `product.quantity_on_hand` is
+    refreshed with the post-movement value.
+    """
+    if transaction_type not in ("IN", "OUT"):
+        raise ValueError(f"Unknown transaction type: {transaction_type}")
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than zero.")
+
+    with transaction.atomic():
+        qs = Product.objects.filter(pk=product.pk)
+
+        delta = quantity if transaction_type == "IN" else -quantity
+        if delta < 0:
+            qs = qs.filter(quantity_on_hand__gte=quantity)
+
+        updated = qs.update(
+            quantity_on_hand=F("quantity_on_hand") + delta,
+            is_low_stock=low_after(delta),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise InsufficientStock(f"Not enough stock available for {product.sku}.")
+
+        # the UPDATE holds the row lock until commit, so this is the balance
+        # this movement produced
+        product.refresh_from_db(fields=["quantity_on_hand", "reorder_level", "is_low_stock", "updated_at"])
+
+        tx = InventoryTransaction.objects.create(
+            product=product,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            unit_cost=product.cost if transaction_type == "IN" else None,
+            balance_after=product.quantity_on_hand,
+            reference=reference,
+            note=note,
+            created_by=user,
+        )
+        rollups.record([tx])
+
+        action = "STOCK_IN" if transaction_type == "IN" else "STOCK_OUT"
+        log(user, action, "Product", product.id, f"{action} {quantity} for {product.sku}")
+
+        record_transition(product, delta)
+
+        # quantity changes go through update(), which sends no signals
+        bump("products", "transactions")
+
+    return tx
+
+
+def movements_from_csv(lines):
+    """
+    Reads movement dicts from CSV text lines with a header row of
+    sku,type,quantity[,reference][,note].
+    """
+    for row in csv.DictReader(lines):
+        yield {
+            "sku": (row.get("sku") or "").strip(),
+            "type": (row.get("type") or "").strip().upper(),
+            "quantity": (row.get("quantity") or "").strip(),
+            "reference": (row.get("reference") or "").strip(),
+            "note": (row.get("note") or "").strip(),
+        }
+
+
+def _quantity(raw):
+    """A movement's quantity as an int, None unless it is a whole number."""
+    if isinstance(raw, bool):
+        return None
+    if isinstance(raw, int):
+        return raw
+    if isinstance(raw, str):
+        # not isdigit(): it accepts characters such as "²" that int() rejects
+        try:
+            return int(raw.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def apply_movements(movements, user=None, chunk_size: int = 500) -> BatchResult:
+    """
+    Applies many movements as one all-or-nothing batch.
+
+    Each movement is a dict with sku, type (IN/OUT), quantity and optional
+    reference/note. SKUs are resolved in one query, quantity deltas are
+    netted per product and applied with one conditional UPDATE each, and the
+    ledger/audit rows are bulk inserted in chunks of `chunk_size`.
+
+    Raises BatchError (nothing written) if any line is invalid or a product's
+    net movement would take its stock below zero.
+    """
+    started = time.perf_counter()
+    movements = list(movements)
+
+    if not all(isinstance(m, dict) for m in movements):
+        raise BatchError(["Each movement must be an object with sku, type and quantity."])
+
+    skus = {m.get("sku") for m in movements if isinstance(m.get("sku"), str)}
+    products = Product.objects.in_bulk(skus, field_name="sku")
+
+    errors = []
+    txs = []
+    deltas = defaultdict(int)
+
+    for line_no, m in enumerate(movements, start=1):
+        sku = m.get("sku")
+        if not isinstance(sku, str):
+            errors.append(f"Line {line_no}: sku must be a string.")
+            continue
+        product = products.get(sku)
+        tx_type = m.get("type")
+        quantity = _quantity(m.get("quantity"))
+
+        if product is None:
+            errors.append(f"Line {line_no}: unknown SKU {sku!r}.")
+            continue
+        if tx_type not in ("IN", "OUT"):
+            errors.append(f"Line {line_no}: type must be IN or OUT.")
+            continue
+        if quantity is None:
+            errors.append(f"Line {line_no}: quantity must be a whole number.")
+            continue
+        if quantity <= 0:
+            errors.append(f"Line {line_no}: quantity must be greater than zero.")
+            continue
+
+        deltas[product.pk] += quantity if tx_type == "IN" else -quantity
+        txs.append(InventoryTransaction(
+            product=product,
+            transaction_type=tx_type,
+            quantity=quantity,
+            unit_cost=product.cost if tx_type == "IN" else None,
+            reference=str(m.get("reference") or "")[:100],
+            note=str(m.get("note") or ""),
+            created_by=user,
+        ))
+
+    if errors:
+        raise BatchError(errors)
+
+    by_pk = {p.pk: p for p in products.values()}
+    now = timezone.now()
+
+    with transaction.atomic():
+        # fixed pk order so concurrent batches lock rows in the same order
+        for pk in sorted(deltas):
+            delta = deltas[pk]
+            qs = Product.objects.filter(pk=pk)
+            if delta < 0:
+                qs = qs.filter(quantity_on_hand__gte=-delta)
+            if not qs.update(
+                quantity_on_hand=F("quantity_on_hand") + delta,
+                is_low_stock=low_after(delta),
+                updated_at=now,
+            ):
+                raise BatchError([f"Not enough stock available for {by_pk[pk].sku}."])
+
+        after = record_transitions(deltas)
+
+        # balances line by line, from each product's quantity before the batch
+        running = {pk: after[pk] - delta for pk, delta in deltas.items()}
+        for tx in txs:
+            running[tx.product_id] += tx.quantity if tx.transaction_type == "IN" else -tx.quantity
+            tx.balance_after = running[tx.product_id]
+
+        InventoryTransaction.objects.bulk_create(txs, batch_size=chunk_size)
+        rollups.record(txs)
+
+        audits = []
+        for tx in txs:
+            action = "STOCK_IN" if tx.transaction_type == "IN" else "STOCK_OUT"
+            audits.append(entry(user, action, "Product", tx.product_id, f"{action} {tx.quantity} for {tx.product.sku}"))
+        log_many(audits, batch_size=chunk_size)
+
+        bump("products", "transactions")
+
+    return BatchResult(rows=len(txs), products=len(deltas), elapsed=time.perf_counter() - started)
@@ -0,0 +1,211 @@
+"""
+Synthetic data for benchmarks.
+
+The ledger is generated in time order, so every product's running balance
+is known while the rows are produced: an OUT that would take stock below
+zero becomes a restock instead, each row carries its balance_after, and
+the final balances are written back to quantity_on_hand. Product
+popularity follows a Zipf-like curve (a few hot SKUs get most of the
+movements) and daily volume has a weekly cycle, a year-end peak and slow
+growth. Everything is drawn from one seeded RNG, so the same arguments
+produce the same data.
+
+Ledger rows bypass the ORM: PostgreSQL gets them through COPY, other
+databases through executemany() in one transaction per chunk. Days are
+generated one after another, so the daily rollup is written as each day
+completes instead of being recomputed from the ledger afterwards.
+"""
+import math
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connection, transaction
+from django.utils.timezone import localdate, make_aware
+
+from .cache import bump
+from .models import Category, InventoryTransaction, Product, ProductDailyMovement
+
+CATEGORIES = [
+    "Beverages", "Snacks", "Office Supplies", "Electronics", "Cleaning", "Hardware",
+    "Packaging", "Personal Care", "Tools", "Kitchen", "Garden", "Toys",
+]
+ADJECTIVES = ["Steel", "Copper", "Plastic", "Wireless", "Organic", "Compact", "Heavy", "Premium", "Basic", "Eco"]
+NOUNS = ["Widget", "Cable", "Bracket", "Filter", "Bottle", "Adapter", "Sensor", "Panel", "Valve", "Hinge"]
+
+# Monday .. Sunday
+WEEKDAY_FACTOR = (1.0, 1.05, 1.1, 1.05, 1.2, 0.6, 0.4)
+
+# chance that a movement of a product at or below its reorder level is the
+# restock delivery; an OUT larger than the stock always becomes one
+RESTOCK_CHANCE = 0.3
+
+# popularity ~ 1 / rank ** ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.1
+
+
+def day_weight(day: date, index: int, days: int) -> float:
+    season = 1 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+    trend = 0.8 + 0.4 * index / max(1, days - 1)
+    return WEEKDAY_FACTOR[day.weekday()] * season * trend
+
+
+def daily_counts(total: int, days: list) -> list:
+    """Splits `total` rows over `days` by weight (largest remainder)."""
+    weights = [day_weight(d, i, len(days)) for i, d in enumerate(days)]
+    scale = total / sum(weights)
+    exact = [w * scale for w in weights]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(days)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+class _BulkWriter:
+    """Raw multi-row inserts, bypassing model instances."""
+
+    LEDGER = ("product_id", "transaction_type", "quantity", "unit_cost", "balance_after", "reference", "note", "created_at")
+    ROLLUP = ("product_id", "day", "qty_in", "qty_out")
+
+    def __init__(self):
+        self.is_pg = connection.vendor == "postgresql"
+        self.rows = 0
+
+    def timestamp(self, midnight: datetime, seconds: int) -> str:
+        # `midnight` is the local day's start in UTC; SQLite stores naive UTC
+        stamp = midnight + timedelta(seconds=seconds)
+        return stamp.isoformat(" ") if self.is_pg else stamp.replace(tzinfo=None).isoformat(" ")
+
+    def write(self, ledger, rollup):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self._insert(cursor, InventoryTransaction, self.LEDGER, ledger)
+            self._insert(cursor, ProductDailyMovement, self.ROLLUP, rollup)
+        self.rows += len(ledger)
+
+    def _insert(self, cursor, model, columns, rows):
+        if not rows:
+            return
+        table = model._meta.db_table
+        names = ", ".join(columns)
+        if self.is_pg:
+            with cursor.copy(f"COPY {table} ({names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows)
+
+
+def _create_products(rng, count, sku_prefix, chunk_size):
+    categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+    batch = []
+    for i in range(count):
+        cost = Decimal(rng.randint(100, 10_000)) / 100
+        batch.append(Product(
+            name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            sku=f"{sku_prefix}{i:08d}",
+            category=rng.choice(categories),
+            cost=cost,
+            price=(cost * Decimal(rng.choice(["1.2", "1.5", "2.0", "2.5"]))).quantize(Decimal("0.01")),
+            reorder_level=rng.choice([0, 5, 10, 20, 50]),
+            quantity_on_hand=0,
+            is_low_stock=True,
+        ))
+        if len(batch) == chunk_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+
+    # SKUs sort in creation order
+    return list(
+        Product.objects.filter(sku__startswith=sku_prefix)
+        .order_by("sku")
+        .values_list("id", "reorder_level", "cost")
+    )
+
+
+def generate(products: int, transactions: int, days: int, seed: int = 42, end: date = None,
+             sku_prefix: str = "SS-", chunk_size: int = 50_000, progress=None) -> dict:
+    """
+    Creates `products` products and `transactions` ledger rows spread over
+    the `days` days ending on `end` (default today). Returns timings.
+    """
+    rng = random.Random(seed)
+    end = end or localdate()
+    timings = {}
+
+    started = time.perf_counter()
+    catalog = _create_products(rng, products, sku_prefix, chunk_size)
+    ids = [pk for pk, _, _ in catalog]
+    reorder = [level for _, level, _ in catalog]
+    costs = [cost for _, _, cost in catalog]
+    timings["products"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # hot SKUs are spread over the catalog, not the first N
+    ranks = list(range(products))
+    rng.shuffle(ranks)
+    cum_weights = list(accumulate(1 / (rank + 1) ** ZIPF_EXPONENT for rank in ranks))
+    population = range(products)
+
+    calendar = [end - timedelta(days=days - 1 - i) for i in range(days)]
+    balances = [0] * products
+    writer = _BulkWriter()
+    rows = []
+    rollup = []
+    serial = 0
+
+    for day, count in zip(calendar, daily_counts(transactions, calendar)):
+        midnight = make_aware(datetime.combine(day, dt_time.min)).astimezone(dt_timezone.utc)
+        picks = rng.choices(population, cum_weights=cum_weights, k=count)
+        # business hours, busiest around midday
+        seconds = sorted(int(rng.triangular(7 * 3600, 21 * 3600, 13 * 3600)) for _ in range(count))
+        moved = {}
+
+        for idx, second in zip(picks, seconds):
+            serial += 1
+            balance = balances[idx]
+            qty = 1 + int(rng.expovariate(0.4))
+            if balance < qty or (balance <= reorder[idx] and rng.random() < RESTOCK_CHANCE):
+                qty = max(20, reorder[idx] * 3) + int(rng.random() * 41)
+                balances[idx] = balance + qty
+                moved.setdefault(idx, [0, 0])[0] += qty
+                rows.append((ids[idx], "IN", qty, costs[idx], balances[idx], f"PO-{serial:09d}", "", writer.timestamp(midnight, second)))
+            else:
+                balances[idx] = balance - qty
+                moved.setdefault(idx, [0, 0])[1] += qty
+                rows.append((ids[idx], "OUT", qty, None, balances[idx], f"SO-{serial:09d}", "", writer.timestamp(midnight, second)))
+
+            if len(rows) == chunk_size:
+                writer.write(rows, rollup)
+                rows, rollup = [], []
+                if progress:
+                    progress(writer.rows)
+
+        day_value = day.isoformat()
+        rollup.extend((ids[idx], day_value, qty_in, qty_out) for idx, (qty_in, qty_out) in moved.items())
+    if rows or rollup:
+        writer.write(rows, rollup)
+        if progress:
+            progress(writer.rows)
+    timings["transactions"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {Product._meta.db_table} SET quantity_on_hand = %s, is_low_stock = %s WHERE id = %s",
+            [(qty, qty <= level, pk) for pk, qty, level in zip(ids, balances, reorder)],
+        )
+    timings["balances"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    timings["analyze"] = time.perf_counter() - started
+
+    bump("products", "transactions")
+    return timings
@@ -1,3 +1,704 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import ApiToken
+
+from . import api, archive, rollups, snapshots, valuation
+from .audit import AuditBufferMiddleware, collect, entry, log, log_many
+from .balances import backfill, drift
+from .catalog import CatalogError, import_csv
+from .forms import ProductForm
+from .jobs import HANDLERS, claim_next_job, enqueue, run_job
+from .models import (
+    AuditLog,
+    Category,
+    ExportJob,
+    InventoryTransaction,
+    LowStockEvent,
+    Product,
+    ProductDailyMovement,
+    StockSnapshot,
+)
+from .snapshots import as_of, starting_point
+from .stock import BatchError, InsufficientStock, apply_movement, apply_movements
+
+
+def make_product(sku, quantity=10, reorder_level=5, category=None):
+    category = category or Category.objects.get_or_create(name="Tools")[0]
+    return Product.objects.create(
+        name=f"Product {sku}",
+        sku=sku,
+        category=category,
+        cost=Decimal("2.50"),
+        price=Decimal("4.00"),
+        reorder_level=reorder_level,
+        quantity_on_hand=quantity,
+    )
+
+
+class ApplyMovementTests(TestCase):
+    def setUp(self):
+        self.product = make_product("SKU-1", quantity=10, reorder_level=5)
+
+    def test_in_adds_stock_and_records_the_balance(self):
+        tx = apply_movement(self.product, "IN", 4, reference="PO-1")
+
+        self.assertEqual(self.product.quantity_on_hand, 14)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_on_hand, 14)
+        self.assertEqual(tx.balance_after, 14)
+        self.assertEqual(tx.unit_cost, Decimal("2.50"))
+
+    def test_out_larger_than_stock_raises_and_writes_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            apply_movement(self.product, "OUT", 11)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_on_hand, 10)
+        self.assertFalse(InventoryTransaction.objects.exists())
+        self.assertFalse(ProductDailyMovement.objects.exists())
+
+    def test_out_of_all_stock_is_allowed(self):
+        tx = apply_movement(self.product, "OUT", 10)
+
+        self.assertEqual(self.product.quantity_on_hand, 0)
+        self.assertEqual(tx.balance_after, 0)
+
+    def test_rejects_bad_type_and_quantity(self):
+        with self.assertRaises(ValueError):
+            apply_movement(self.product, "MOVE", 1)
+        with self.assertRaises(ValueError):
+            apply_movement(self.product, "IN", 0)
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+    def test_crossing_the_reorder_level_records_events(self):
+        apply_movement(self.product, "OUT", 5)
+        self.assertTrue(self.product.is_low_stock)
+        apply_movement(self.product, "OUT", 1)
+        apply_movement(self.product, "IN", 10)
+        self.assertFalse(self.product.is_low_stock)
+
+        events = list(LowStockEvent.objects.filter(product=self.product).order_by("id").values_list("became_low", "quantity_on_hand"))
+        self.assertEqual(events, [(True, 5), (False, 14)])
+
+    def test_rollup_totals_follow_the_ledger(self):
+        apply_movement(self.product, "IN", 3)
+        apply_movement(self.product, "OUT", 2)
+        apply_movement(self.product, "OUT", 1)
+
+        rollup = ProductDailyMovement.objects.get(product=self.product, day=timezone.localdate())
+        self.assertEqual((rollup.qty_in, rollup.qty_out), (3, 3))
+
+
+class ApplyMovementsTests(TestCase):
+    def setUp(self):
+        self.a = make_product("A-1", quantity=10, reorder_level=5)
+        self.b = make_product("B-1", quantity=2, reorder_level=0)
+
+    def quantities(self):
+        return dict(Product.objects.values_list("sku", "quantity_on_hand"))
+
+    def test_batch_applies_every_line(self):
+        result = apply_movements([
+            {"sku": "A-1", "type": "OUT", "quantity": 3, "reference": "SO-1"},
+            {"sku": "B-1", "type": "IN", "quantity": "5"},
+            {"sku": "A-1", "type": "IN", "quantity": 1},
+        ])
+
+        self.assertEqual((result.rows, result.products), (3, 2))
+        self.assertEqual(self.quantities(), {"A-1": 8, "B-1": 7})
+        balances = list(InventoryTransaction.objects.filter(product=self.a).order_by("id").values_list("balance_after", flat=True))
+        self.assertEqual(balances, [7, 8])
+
+    def test_lines_are_netted_per_product(self):
+        # the OUT alone would oversell; with the IN before it the batch nets to -2
+        apply_movements([
+            {"sku": "B-1", "type": "IN", "quantity": 3},
+            {"sku": "B-1", "type": "OUT", "quantity": 5},
+        ])
+        self.assertEqual(self.quantities()["B-1"], 0)
+
+    def test_one_oversold_product_writes_nothing(self):
+        with self.assertRaises(BatchError) as caught:
+            apply_movements([
+                {"sku": "A-1", "type": "OUT", "quantity": 4},
+                {"sku": "B-1", "type": "OUT", "quantity": 3},
+            ])
+
+        self.assertIn("B-1", caught.exception.errors[0])
+        self.assertEqual(self.quantities(), {"A-1": 10, "B-1": 2})
+        self.assertFalse(InventoryTransaction.objects.exists())
+        self.assertFalse(ProductDailyMovement.objects.exists())
+        self.assertFalse(LowStockEvent.objects.exists())
+
+    def test_one_invalid_line_writes_nothing(self):
+        with self.assertRaises(BatchError) as caught:
+            apply_movements([
+                {"sku": "A-1", "type": "IN", "quantity": 1},
+                {"sku": "NOPE", "type": "IN", "quantity": 1},
+                {"sku": ["A-1"], "type": "IN", "quantity": 1},
+                {"sku": "A-1", "type": "OUT", "quantity": 1.5},
+                {"sku": "A-1", "type": "OUT", "quantity": 0},
+            ])
+
+        self.assertEqual(caught.exception.errors, [
+            "Line 2: unknown SKU 'NOPE'.",
+            "Line 3: sku must be a string.",
+            "Line 4: quantity must be a whole number.",
+            "Line 5: quantity must be greater than zero.",
+        ])
+        self.assertEqual(self.quantities(), {"A-1": 10, "B-1": 2})
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+    def test_low_stock_events_and_rollups_are_recorded(self):
+        apply_movements([
+            {"sku": "A-1", "type": "OUT", "quantity": 6},
+            {"sku": "B-1", "type": "OUT", "quantity": 1},
+        ])
+
+        self.assertEqual(list(LowStockEvent.objects.values_list("product__sku", "became_low")), [("A-1", True)])
+        rollup = ProductDailyMovement.objects.get(product=self.a, day=timezone.localdate())
+        self.assertEqual((rollup.qty_in, rollup.qty_out), (0, 6))
+
+
+class ProductUpdateTests(TestCase):
+    def setUp(self):
+        self.product = make_product("SKU-1", quantity=10, reorder_level=5)
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "admin@example.com", "pw"))
+
+    def test_an_edit_keeps_stock_moved_while_it_was_open(self):
+        clean = ProductForm.clean
+
+        def clean_then_move(form):
+            # a movement commits after the view has loaded the product
+            apply_movement(Product.objects.get(pk=self.product.pk), "OUT", 6)
+            return clean(form)
+
+        with mock.patch.object(ProductForm, "clean", clean_then_move):
+            response = self.client.post(reverse("inventory:product_update", args=[self.product.pk]), {
+                "name": "Renamed",
+                "sku": "SKU-1",
+                "category": self.product.category_id,
+                "cost": "2.50",
+                "price": "4.00",
+                "reorder_level": 5,
+                "is_active": "on",
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.quantity_on_hand), ("Renamed", 4))
+        self.assertTrue(self.product.is_low_stock)
+        self.assertEqual(LowStockEvent.objects.filter(product=self.product).count(), 1)
+
+    def test_raising_the_reorder_level_marks_the_product_low(self):
+        self.client.post(reverse("inventory:product_update", args=[self.product.pk]), {
+            "name": self.product.name,
+            "sku": "SKU-1",
+            "category": self.product.category_id,
+            "cost": "2.50",
+            "price": "4.00",
+            "reorder_level": 12,
+            "is_active": "on",
+        })
+
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.is_low_stock)
+        self.assertTrue(LowStockEvent.objects.filter(product=self.product, became_low=True).exists())
+
+
+class ValuationTests(TestCase):
+    def setUp(self):
+        self.product = make_product("SKU-1", quantity=0)
+
+    def receive(self, quantity, cost):
+        self.product.cost = Decimal(cost)
+        Product.objects.filter(pk=self.product.pk).update(cost=self.product.cost)
+        apply_movement(self.product, "IN", quantity)
+
+    def test_fifo_values_the_newest_receipts(self):
+        self.receive(5, "2.00")
+        self.receive(5, "3.00")
+        apply_movement(self.product, "OUT", 2)
+        make_product("SKU-2", quantity=4)  # no receipts: valued at cost
+
+        totals = valuation.compute()["totals"]
+
+        self.assertEqual(totals["units"], 12)
+        # 5 x 3.00 + 3 x 2.00, plus 4 x 2.50
+        self.assertEqual(totals["fifo_value"], Decimal("31.00"))
+        self.assertEqual(totals["standard_value"], Decimal("34.00"))
+        self.assertEqual(totals["uncosted_units"], 4)
+
+    def test_reports_are_computed_by_the_worker(self):
+        self.receive(4, "2.00")
+        queued = ExportJob.objects.filter(kind="VALUATION", status="PENDING")
+
+        self.assertIsNone(valuation.current())
+        self.assertIsNone(valuation.current())
+        self.assertEqual(queued.count(), 1)
+
+        run_job(claim_next_job())
+        report = valuation.current()
+        self.assertFalse(report["stale"])
+        self.assertEqual(report["totals"]["fifo_value"], Decimal("8.00"))
+        self.assertFalse(queued.exists())
+
+        apply_movement(self.product, "OUT", 1)
+        self.assertTrue(valuation.current()["stale"])
+        self.assertEqual(queued.count(), 1)
+
+
+class StockBatchViewTests(TestCase):
+    def setUp(self):
+        make_product("A-1", quantity=10)
+        self.client.force_login(get_user_model().objects.create_user("clerk", password="pw"))
+        self.url = reverse("inventory:stock_batch")
+
+    def post(self, body, content_type="application/json"):
+        response = self.client.post(self.url, body, content_type=content_type)
+        return response.status_code, response.json()
+
+    def test_csv_quantities_int_cannot_read_are_line_errors(self):
+        status, body = self.post("sku,type,quantity\nA-1,IN,²\nA-1,IN,--5\nA-1,IN,3\n", content_type="text/csv")
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body["errors"], [
+            "Line 1: quantity must be a whole number.",
+            "Line 2: quantity must be a whole number.",
+        ])
+        self.assertEqual(Product.objects.get(sku="A-1").quantity_on_hand, 10)
+
+    def test_malformed_bodies_are_rejected(self):
+        self.assertEqual(self.post(b"\xff\xfe")[0], 400)
+        self.assertEqual(self.post("{not json")[0], 400)
+        self.assertEqual(self.post('{"movements": {"sku": "A-1"}}')[0], 400)
+        self.assertEqual(self.post('{"movements": ["A-1"]}')[0], 400)
+
+    def test_valid_batch(self):
+        status, body = self.post('{"movements": [{"sku": "A-1", "type": "OUT", "quantity": "4"}]}')
+
+        self.assertEqual((status, body["ok"], body["rows"]), (200, True, 1))
+        self.assertEqual(Product.objects.get(sku="A-1").quantity_on_hand, 6)
+
+
+def inserts(queries):
+    return [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+
+
+def log_twice(request=None):
+    log(None, "PRODUCT_UPDATE", "Product", 1, "first")
+    log(None, "PRODUCT_UPDATE", "Product", 2, "second")
+    return HttpResponse()
+
+
+class AuditLogTests(TestCase):
+    def test_a_rolled_back_transaction_logs_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                log(None, "PRODUCT_UPDATE", "Product", 1, "rolled back")
+                transaction.set_rollback(True)
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(AuditLog.objects.exists())
+
+    def test_events_are_written_once_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            log(None, "PRODUCT_UPDATE", "Product", 1, "committed")
+        self.assertFalse(AuditLog.objects.exists())
+
+        callbacks[0]()
+        self.assertEqual(AuditLog.objects.get().message, "committed")
+
+    def test_a_scope_writes_its_events_in_one_insert(self):
+        with self.assertNumQueries(1):
+            with collect():
+                with self.captureOnCommitCallbacks(execute=True):
+                    log_twice()
+                    log_many([entry(None, "STOCK_IN", "Product", 3, "third")])
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+
+# a real commit per log() call: TestCase's transaction would hold them back
+class AuditBufferMiddlewareTests(TransactionTestCase):
+    def test_a_request_writes_its_events_in_one_insert(self):
+        middleware = AuditBufferMiddleware(log_twice)
+
+        with CaptureQueriesContext(connection) as queries:
+            middleware(RequestFactory().get("/"))
+        self.assertEqual(len(inserts(queries)), 1)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_an_async_request_writes_its_events_in_one_insert(self):
+        async def view(request):
+            return await sync_to_async(log_twice)()
+
+        middleware = AuditBufferMiddleware(view)
+
+        with CaptureQueriesContext(connection) as queries:
+            async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertEqual(len(inserts(queries)), 1)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_a_request_that_rolls_back_writes_nothing(self):
+        def view(request):
+            with transaction.atomic():
+                log_twice()
+                transaction.set_rollback(True)
+            return HttpResponse()
+
+        with CaptureQueriesContext(connection) as queries:
+            AuditBufferMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(inserts(queries), [])
+        self.assertFalse(AuditLog.objects.exists())
+
+
+def backdate(product, movements):
+    """Applies (days_ago, type, quantity) movements in order, each dated local noon `days_ago` days back."""
+    today = timezone.localdate()
+    for days_ago, tx_type, quantity in movements:
+        tx = apply_movement(product, tx_type, quantity)
+        moment = timezone.make_aware(datetime.combine(today - timedelta(days=days_ago), dt_time(12)))
+        InventoryTransaction.objects.filter(pk=tx.pk).update(created_at=moment)
+
+
+def replayed(day):
+    """Quantity per product at the end of `day`, replaying the ledger row by row."""
+    quantities = dict.fromkeys(Product.objects.values_list("pk", flat=True), 0)
+    for tx in InventoryTransaction.objects.order_by("created_at", "id"):
+        if timezone.localdate(tx.created_at) <= day:
+            quantities[tx.product_id] += tx.quantity if tx.transaction_type == "IN" else -tx.quantity
+    return quantities
+
+
+class StockAsOfTests(TestCase):
+    def setUp(self):
+        self.a = make_product("A-1", quantity=0)
+        self.b = make_product("B-1", quantity=0)
+        make_product("C-1", quantity=0)  # never moves
+        backdate(self.a, [(12, "IN", 20), (10, "OUT", 5), (9, "IN", 3), (6, "OUT", 4), (3, "OUT", 2), (2, "IN", 7), (0, "OUT", 1)])
+        backdate(self.b, [(11, "IN", 5), (8, "OUT", 5), (4, "IN", 9), (1, "OUT", 3)])
+        # the stock service dated the rollup today
+        rollups.rebuild()
+        self.today = timezone.localdate()
+
+    def days_ago(self, n):
+        return self.today - timedelta(days=n)
+
+    def snapshot(self, day):
+        StockSnapshot.objects.bulk_create(
+            [StockSnapshot(product_id=pk, taken_on=day, quantity=qty) for pk, qty in replayed(day).items()]
+        )
+
+    def assertMatchesLedger(self, day, kind):
+        self.assertEqual(starting_point(day)[0], kind)
+        found = as_of(day)
+        self.assertEqual({pk: found.get(pk, 0) for pk in replayed(day)}, replayed(day))
+
+    def test_from_live_quantities(self):
+        for n in range(14):
+            with self.subTest(days_ago=n):
+                self.assertMatchesLedger(self.days_ago(n), "live")
+
+    def test_from_a_snapshot_before_the_day(self):
+        self.snapshot(self.days_ago(10))
+
+        for n in (10, 9, 8, 7):
+            with self.subTest(days_ago=n):
+                self.assertMatchesLedger(self.days_ago(n), "before")
+
+    def test_from_a_snapshot_after_the_day(self):
+        self.snapshot(self.days_ago(5))
+
+        for n in (8, 7, 6):
+            with self.subTest(days_ago=n):
+                self.assertMatchesLedger(self.days_ago(n), "after")
+
+    def test_limited_to_some_products(self):
+        day = self.days_ago(7)
+        self.assertEqual(as_of(day, [self.a.pk]), {self.a.pk: replayed(day)[self.a.pk]})
+
+    def test_take_stores_the_ledger_quantities_chunk_by_chunk(self):
+        self.snapshot(self.days_ago(10))
+        day = self.days_ago(7)
+
+        with mock.patch.object(snapshots, "CHUNK_SIZE", 1):
+            self.assertEqual(snapshots.take(day), 3)
+
+        stored = dict(StockSnapshot.objects.filter(taken_on=day).values_list("product_id", "quantity"))
+        self.assertEqual(stored, replayed(day))
+
+
+class BalanceBackfillTests(TestCase):
+    def setUp(self):
+        self.a = make_product("A-1", quantity=0)
+        self.b = make_product("B-1", quantity=0)
+        backdate(self.a, [(5, "IN", 20), (4, "OUT", 5), (3, "IN", 3), (1, "OUT", 4)])
+        backdate(self.b, [(4, "IN", 5), (2, "OUT", 5), (0, "IN", 9)])
+        self.expected = dict(InventoryTransaction.objects.values_list("pk", "balance_after"))
+
+    def test_backfill_restores_running_balances(self):
+        self.assertEqual(sorted(self.expected.values()), [0, 5, 9, 14, 15, 18, 20])
+        InventoryTransaction.objects.update(balance_after=None)
+        self.assertEqual(list(drift().values_list("sku", flat=True)), ["A-1", "B-1"])
+
+        result = backfill(chunk_size=1)
+
+        self.assertEqual((result.products, result.updated), (2, 7))
+        self.assertEqual(dict(InventoryTransaction.objects.values_list("pk", "balance_after")), self.expected)
+        self.assertFalse(drift().exists())
+        self.assertEqual(backfill().updated, 0)
+
+    def test_backfill_repairs_drifted_rows(self):
+        newest = InventoryTransaction.objects.filter(product=self.a).order_by("-created_at", "-id").first()
+        InventoryTransaction.objects.filter(pk=newest.pk).update(balance_after=99)
+        self.assertEqual(list(drift().values_list("sku", "last_balance")), [("A-1", 99)])
+
+        self.assertEqual(backfill().updated, 1)
+        self.assertFalse(drift().exists())
+        self.assertEqual(dict(InventoryTransaction.objects.values_list("pk", "balance_after")), self.expected)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        _, self.key = ApiToken.issue(self.admin)
+        for sku in ("A-1", "B-1", "C-1"):
+            make_product(sku, quantity=10, reorder_level=5)
+
+    def get(self, url, key=None):
+        return self.client.get(url, headers={"Authorization": f"Bearer {key or self.key}"})
+
+    def bulk(self, products, key=None):
+        return self.client.post(
+            "/api/v1/products/bulk/",
+            {"products": products},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {key or self.key}"},
+        )
+
+    def test_requests_need_a_valid_token_or_session(self):
+        self.assertEqual(self.client.get("/api/v1/products/").status_code, 401)
+        self.assertEqual(self.get("/api/v1/products/", key="nope").status_code, 401)
+        response = self.client.get("/api/v1/products/", headers={"Authorization": f"Token {self.key}"})
+        self.assertEqual(response.status_code, 401)
+
+        self.assertEqual(self.get("/api/v1/products/").status_code, 200)
+        self.assertIsNotNone(ApiToken.objects.get().last_used_at)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.get("/api/v1/products/").status_code, 401)
+
+    def test_session_writes_need_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        response = client.post("/api/v1/products/bulk/", {"products": []}, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_fields_selects_the_returned_keys(self):
+        rows = self.get("/api/v1/products/?fields=sku,quantity_on_hand").json()["results"]
+        self.assertEqual(rows[0], {"sku": "A-1", "quantity_on_hand": 10})
+
+        response = self.get("/api/v1/products/?fields=sku,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["errors"][0])
+
+    def test_pages_link_to_each_other(self):
+        first = self.get("/api/v1/products/?fields=sku&limit=2").json()
+        self.assertEqual([row["sku"] for row in first["results"]], ["A-1", "B-1"])
+        self.assertIsNone(first["previous"])
+
+        second = self.get(first["next"]).json()
+        self.assertEqual([row["sku"] for row in second["results"]], ["C-1"])
+        self.assertIsNone(second["next"])
+
+        back = self.get(second["previous"]).json()
+        self.assertEqual([row["sku"] for row in back["results"]], ["A-1", "B-1"])
+
+    def test_bulk_creates_and_updates_by_sku(self):
+        response = self.bulk([
+            {"sku": "A-1", "name": "Renamed", "category": "Tools", "cost": "3.00", "price": "5.00", "reorder_level": 12},
+            {"sku": "N-1", "name": "New", "category": "Fasteners", "cost": 1.1, "price": 2},
+        ])
+
+        body = response.json()
+        self.assertEqual((response.status_code, body["created"], body["updated"]), (200, 1, 1))
+        renamed = Product.objects.get(sku="A-1")
+        # quantity is untouched; the higher reorder level makes it low
+        self.assertEqual((renamed.name, renamed.quantity_on_hand, renamed.is_low_stock), ("Renamed", 10, True))
+        new = Product.objects.select_related("category").get(sku="N-1")
+        self.assertEqual((new.category.name, new.cost, new.quantity_on_hand), ("Fasteners", Decimal("1.10"), 0))
+        self.assertEqual(
+            set(LowStockEvent.objects.values_list("product__sku", "became_low")),
+            {("A-1", True), ("N-1", True)},
+        )
+
+    def test_bulk_writes_nothing_unless_every_row_is_valid(self):
+        response = self.bulk([
+            {"sku": "N-1", "name": "New", "category": "Tools", "cost": "1.00", "price": "2.00"},
+            {"sku": "N-2", "name": "", "category": "Tools", "cost": "1.00", "price": "2.00"},
+            {"sku": "N-3", "name": "Cheap", "category": ["Tools"], "cost": "x", "price": "2.00"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual([(e["index"], e["sku"]) for e in errors], [(1, "N-2"), (2, "N-3")])
+        self.assertEqual(errors[0]["errors"], ["name: This field is required."])
+        self.assertIn("category: Enter a category name.", errors[1]["errors"])
+        self.assertFalse(Product.objects.filter(sku__startswith="N-").exists())
+
+    def test_bulk_size_is_limited(self):
+        row = {"sku": "N-1", "name": "New", "category": "Tools", "cost": "1.00", "price": "2.00"}
+        with mock.patch.object(api, "BULK_MAX", 2):
+            response = self.bulk([row] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], ["At most 2 products per request."])
+
+    def test_bulk_needs_an_admin(self):
+        clerk = get_user_model().objects.create_user("clerk", password="pw")
+        _, key = ApiToken.issue(clerk)
+        self.assertEqual(self.bulk([], key=key).status_code, 403)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        make_product("A-1", quantity=10, reorder_level=5)
+
+    def test_import_upserts_valid_rows_and_reports_the_rest(self):
+        lines = io.StringIO(
+            "sku,name,category,cost,price,reorder_level\n"
+            "A-1,Renamed,Tools,3.00,5.00,12\n"
+            "N-1,New,Fasteners,1.00,2.00,\n"
+            "N-2,,Tools,1.00,2.00,\n"
+            f"N-3,Long,{'x' * 101},1.00,2.00,\n"
+            "N-4,Cheap,Tools,abc,2.00,\n"
+        )
+        rejected = io.StringIO()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_csv(lines, rejected=rejected, chunk_size=2)
+
+        self.assertEqual((result.created, result.updated, result.rejected), (1, 1, 3))
+        renamed = Product.objects.get(sku="A-1")
+        self.assertEqual((renamed.name, renamed.quantity_on_hand, renamed.is_low_stock), ("Renamed", 10, True))
+        self.assertTrue(Product.objects.filter(sku="N-1", category__name="Fasteners").exists())
+
+        rows = list(csv.DictReader(io.StringIO(rejected.getvalue())))
+        self.assertEqual([(row["line"], row["sku"]) for row in rows], [("4", "N-2"), ("5", "N-3"), ("6", "N-4")])
+        self.assertEqual(rows[0]["errors"], "name: This field is required.")
+        self.assertTrue(rows[1]["errors"].startswith("category: Ensure this value has at most 100 characters"))
+        self.assertTrue(rows[2]["errors"].startswith("cost: "))
+
+        # one summary entry per chunk with valid rows, none per product
+        self.assertEqual(list(AuditLog.objects.order_by("id").values_list("action", "message")), [
+            ("PRODUCT_IMPORT", "Imported CSV lines 2-3: 1 created, 1 updated, 0 rejected"),
+        ])
+
+    def test_a_missing_column_is_an_error(self):
+        with self.assertRaises(CatalogError):
+            import_csv(io.StringIO("sku,name,price\nA-1,Thing,2.00\n"))
+
+
+class ImportProductsCommandTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "catalog.csv")
+
+    def test_rejected_rows_file_is_kept_only_when_rows_were_rejected(self):
+        with open(self.path, "w") as f:
+            f.write("sku,name,category,cost,price\nN-1,New,Tools,1.00,2.00\nN-2,,Tools,1.00,2.00\n")
+        call_command("import_products", self.path, stdout=io.StringIO(), stderr=io.StringIO())
+        with open(os.path.join(self.dir.name, "catalog.rejected.csv")) as f:
+            self.assertIn("N-2", f.read())
+
+        with open(self.path, "w") as f:
+            f.write("sku,name,category,cost,price\nN-1,New,Tools,1.00,2.00\n")
+        os.remove(os.path.join(self.dir.name, "catalog.rejected.csv"))
+        call_command("import_products", self.path, stdout=io.StringIO())
+        self.assertEqual(os.listdir(self.dir.name), ["catalog.csv"])
+
+    def test_a_missing_file_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, "Can't read"):
+            call_command("import_products", os.path.join(self.dir.name, "missing.csv"))
+
+    def test_a_file_that_is_not_utf8_leaves_no_rejected_rows_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"sku,name,category,cost,price\nN-1,Caf\xe9,Tools,1.00,2.00\n")
+
+        with self.assertRaisesMessage(CommandError, "is not UTF-8"):
+            call_command("import_products", self.path, stdout=io.StringIO())
+        self.assertEqual(os.listdir(self.dir.name), ["catalog.csv"])
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.enterContext(override_settings(AUDIT_ARCHIVE_DIR=self.dir.name))
+
+    def archive_old(self, *messages, days_ago=400):
+        moment = timezone.now() - timedelta(days=days_ago)
+        for message in messages:
+            AuditLog.objects.create(action="PRODUCT_UPDATE", entity_type="Product", entity_id=1, message=message, created_at=moment)
+        return archive.archive(older_than_days=365)
+
+    def test_archived_rows_are_read_back_once(self):
+        self.assertEqual(self.archive_old("a", "b", days_ago=401), 2)
+        self.assertEqual(self.archive_old("c", days_ago=400), 1)
+        self.assertFalse(AuditLog.objects.exists())
+
+        # a crash between the append and the delete archives a batch again
+        day = (timezone.now() - timedelta(days=401)).astimezone(dt_timezone.utc).date()
+        path = archive.partition_path(day)
+        records = list(archive.scan())
+        archive._append(path, [dict(r, created_at=r["created_at"].isoformat()) for r in records[:2]])
+
+        self.assertEqual([r["message"] for r in archive.scan()], ["a", "b", "c"])
+        self.assertEqual([r["message"] for r in archive.scan(start=day, end=day)], ["a", "b"])
+
+
+class RunJobTests(TestCase):
+    def test_a_job_handed_to_another_worker_is_left_alone(self):
+        job = enqueue("SEED_DEMO")
+        job = claim_next_job()
+
+        def stalled(job):
+            # meanwhile the job went stale and another worker claimed it
+            ExportJob.objects.filter(pk=job.pk).update(attempts=F("attempts") + 1)
+            raise RuntimeError("lost the job")
+
+        with mock.patch.dict(HANDLERS, {"SEED_DEMO": stalled}):
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ("RUNNING", 2, ""))
+
+    def test_a_finished_job_is_saved(self):
+        job = enqueue("SEED_DEMO")
+        job = claim_next_job()
+
+        with mock.patch.dict(HANDLERS, {"SEED_DEMO": lambda job: job.params.update(done=True)}):
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.params), ("DONE", 100, {"done": True}))
+        self.assertIsNotNone(job.finished_at)
@@ -6,15 +6,26 @@ app_name = "inventory"
 urlpatterns = [
     path("products/", views.product_list, name="product_list"),
     path("products/new/", views.product_create, name="product_create"),
+    path("products/import/", views.product_import, name="product_import"),
+    path("products/low-stock/feed/", views.low_stock_feed, name="low_stock_feed"),
     path("products/<int:pk>/", views.product_detail, name="product_detail"),
+    path("products/<int:pk>/history/", views.product_history, name="product_history"),
     path("products/<int:pk>/edit/", views.product_update, name="product_update"),
     path("products/<int:pk>/stock/", views.stock_transaction, name="stock_transaction"),
     path("reports/", views.reports_home, name="reports_home"),
     path("reports/products.csv", views.export_products_csv, name="export_products_csv"),
     path("reports/transactions.csv", views.export_transactions_csv, name="export_transactions_csv"),
-    path("reports/transactions.pdf", views.export_transactions_pdf, name="export_transactions_pdf"),
+    path("reports/stock-as-of/", views.stock_as_of, name="stock_as_of"),
+    path("reports/stock-as-of.csv", views.export_stock_as_of_csv, name="export_stock_as_of_csv"),
+    path("reports/valuation/", views.valuation_report, name="valuation_report"),
+    path("reports/valuation.csv", views.export_valuation_csv, name="export_valuation_csv"),
+    path("reports/jobs/new/", views.export_job_create, name="export_job_create"),
+    path("reports/jobs/<int:pk>/", views.export_job_detail, name="export_job_detail"),
+    path("reports/jobs/<int:pk>/status/", views.export_job_status, name="export_job_status"),
+    path("reports/jobs/<int:pk>/download/", views.export_job_download, name="export_job_download"),
     path("audit/", views.audit_list, name="audit_list"),
     path("transactions/", views.transaction_list, name="transaction_list"),
+    path("transactions/batch/", views.stock_batch, name="stock_batch"),
     path("categories/", views.category_list, name="category_list"),
     path("categories/new/", views.category_create, name="category_create"),
     path("categories/<int:pk>/edit/", views.category_update, name="category_update"),
@@ -0,0 +1,271 @@
+"""
+View benchmarks with query budgets.
+
+Every route in inventory.urls and inventory.api_urls (plus the dashboard)
+has a ViewCase. A case
+is requested `repeat` times through the Django test client against the
+current database; each run records wall time, the number of SQL queries and
+their total time. A case fails if it runs more queries than its budget, and
+`compare()` flags regressions against a saved baseline. Requests that write
+run inside a transaction that is rolled back, so the dataset doesn't drift
+between runs.
+"""
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+
+from .cache import invalidate_all
+from .exports import CHUNK_SIZE as EXPORT_CHUNK_SIZE
+from .models import Category, ExportJob, Product
+
+# latency changes smaller than this are noise, whatever the ratio
+MIN_REGRESSION_MS = 2.0
+
+
+@dataclass
+class ViewCase:
+    name: str
+    url: str
+    # most SQL queries the view may run (cold caches)
+    query_budget: int
+    method: str = "GET"
+    data: dict = field(default_factory=dict)
+    content_type: str = None
+    status: int = 200
+    headers: dict = field(default_factory=dict)
+
+
+@dataclass
+class ViewResult:
+    name: str
+    method: str
+    url: str
+    status: int
+    p50_ms: float
+    p95_ms: float
+    queries: int
+    sql_ms: float
+    query_budget: int
+    headers: dict = field(default_factory=dict)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.queries > self.query_budget
+
+    @property
+    def key(self) -> str:
+        """Method, URL and any extra headers (e.g. HX-Request)."""
+        return " ".join([self.method, self.url] + [f"[{k}: {v}]" for k, v in sorted(self.headers.items())])
+
+
+def route_names():
+    """Names of every route the suite has to cover (API routes as "api:<name>")."""
+    names = {"dashboard"}
+    for urlconf, prefix in (("inventory.urls", ""), ("inventory.api_urls", "api:")):
+        for pattern in get_resolver(urlconf).url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                names.add(prefix + pattern.name)
+            elif isinstance(pattern, URLResolver):
+                raise ValueError(f"nested includes in {urlconf} are not supported")
+    return names
+
+
+def benchmark_job(user):
+    """A finished export owned by `user`, for the job detail/status/download views."""
+    job = ExportJob.objects.create(
+        kind="PRODUCTS_CSV",
+        status="DONE",
+        progress=100,
+        created_by=user,
+        finished_at=timezone.now(),
+    )
+    job.result.save(f"{job.pk}-bench.csv", ContentFile(b"sku,name\n"), save=True)
+    return job
+
+
+def default_cases(job_id: int):
+    product = Product.objects.select_related("category").filter(is_active=True, quantity_on_hand__gt=0).order_by("id").first()
+    category = Category.objects.order_by("id").first()
+    week_ago = (timezone.localdate() - timedelta(days=7)).isoformat()
+    htmx = {"HX-Request": "true"}
+    # the stock-as-of CSV looks quantities up one chunk of products at a time
+    as_of_chunks = max(1, -(-Product.objects.count() // EXPORT_CHUNK_SIZE))
+    valued = ExportJob.objects.filter(kind="VALUATION", status="DONE").exists()
+
+    cases = [
+        ViewCase("dashboard", "/", 5),
+        ViewCase("dashboard", "/", 5, headers=htmx),
+        # +1 on PostgreSQL for the planner's row estimate
+        ViewCase("product_list", "/products/", 5),
+        ViewCase("product_list", "/products/?q=widget", 5),
+        ViewCase("product_list", "/products/?low_stock=1&active=all", 5),
+        ViewCase("product_list", "/products/?q=widget", 4, headers=htmx),
+        ViewCase("product_create", "/products/new/", 4),
+        ViewCase("product_import", "/products/import/", 3),
+        ViewCase("low_stock_feed", "/products/low-stock/feed/", 3),
+        ViewCase("reports_home", "/reports/", 5),
+        ViewCase("export_products_csv", "/reports/products.csv", 3),
+        ViewCase("export_transactions_csv", f"/reports/transactions.csv?start={week_ago}", 3),
+        ViewCase("stock_as_of", f"/reports/stock-as-of/?date={week_ago}", 7),
+        ViewCase("export_stock_as_of_csv", f"/reports/stock-as-of.csv?date={week_ago}", 5 + 2 * as_of_chunks),
+        ViewCase("valuation_report", "/reports/valuation/", 7),
+        # redirects to the report page until a VALUATION job has run
+        ViewCase("export_valuation_csv", "/reports/valuation.csv", 7, status=200 if valued else 302),
+        ViewCase("export_job_create", "/reports/jobs/new/", 4, method="POST", data={"kind": "PRODUCTS_CSV"}, status=302),
+        ViewCase("export_job_detail", f"/reports/jobs/{job_id}/", 3),
+        ViewCase("export_job_status", f"/reports/jobs/{job_id}/status/", 3),
+        ViewCase("export_job_download", f"/reports/jobs/{job_id}/download/", 3),
+        ViewCase("audit_list", "/audit/", 4),
+        ViewCase("transaction_list", "/transactions/", 4),
+        ViewCase("transaction_list", "/transactions/?type=OUT", 4),
+        ViewCase("transaction_list", "/transactions/?q=widget", 4),
+        ViewCase("transaction_list", "/transactions/?type=OUT", 4, headers=htmx),
+        ViewCase("category_list", "/categories/", 3),
+        ViewCase("category_create", "/categories/new/", 3),
+        ViewCase("api:products", "/api/v1/products/", 3),
+        ViewCase("api:products", "/api/v1/products/?fields=sku,quantity_on_hand&limit=1000", 3),
+        ViewCase("api:categories", "/api/v1/categories/", 3),
+        ViewCase("api:transactions", f"/api/v1/transactions/?since={week_ago}", 3),
+    ]
+    if category is not None:
+        cases.append(ViewCase("category_update", f"/categories/{category.pk}/edit/", 4))
+    if product is not None:
+        cases += [
+            ViewCase("product_detail", f"/products/{product.pk}/", 4),
+            ViewCase("product_history", f"/products/{product.pk}/history/", 4),
+            ViewCase("product_update", f"/products/{product.pk}/edit/", 5),
+            ViewCase("stock_transaction", f"/products/{product.pk}/stock/", 3),
+            ViewCase("api:product_detail", f"/api/v1/products/{product.sku}/", 3),
+            ViewCase(
+                "api:products_bulk",
+                "/api/v1/products/bulk/",
+                11,  # includes the chunk's SAVEPOINT and RELEASE
+                method="POST",
+                data={"products": [{
+                    "sku": product.sku,
+                    "name": product.name,
+                    "category": product.category.name,
+                    "cost": str(product.cost),
+                    "price": str(product.price),
+                    "reorder_level": product.reorder_level,
+                }]},
+                content_type="application/json",
+            ),
+            ViewCase(
+                "stock_transaction",
+                f"/products/{product.pk}/stock/",
+                10,
+                method="POST",
+                data={"transaction_type": "OUT", "quantity": 1, "reference": "bench"},
+                status=302,
+            ),
+            ViewCase(
+                "stock_batch",
+                "/transactions/batch/",
+                11,
+                method="POST",
+                data={"movements": [{"sku": product.sku, "type": "IN", "quantity": 1}] * 50},
+                content_type="application/json",
+            ),
+        ]
+    return cases
+
+
+def _request(client, case):
+    if case.method == "GET":
+        response = client.get(case.url, headers=case.headers)
+    elif case.content_type:
+        response = client.post(case.url, case.data, content_type=case.content_type, headers=case.headers)
+    else:
+        response = client.post(case.url, case.data, headers=case.headers)
+    if getattr(response, "streaming", False):
+        b"".join(response.streaming_content)
+    return response
+
+
+class _QueryTimer:
+    """connection.execute_wrapper that counts queries and sums their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _run_once(client, case, cold: bool):
+    if cold:
+        invalidate_all()
+    timer = _QueryTimer()
+    with connection.execute_wrapper(timer):
+        started = time.perf_counter()
+        if case.method == "GET":
+            response = _request(client, case)
+        else:
+            with transaction.atomic():
+                response = _request(client, case)
+                transaction.set_rollback(True)
+        elapsed = time.perf_counter() - started
+    if response.status_code != case.status:
+        raise RuntimeError(f"{case.method} {case.url} returned {response.status_code}, expected {case.status}")
+    return elapsed * 1000, timer.count, timer.seconds * 1000
+
+
+def run_case(client, case: ViewCase, repeat: int = 20, cold: bool = True) -> ViewResult:
+    # one untimed run to warm imports, templates and connections
+    _run_once(client, case, cold)
+
+    timings, queries, sql_times = [], 0, []
+    for _ in range(repeat):
+        ms, queries, sql_ms = _run_once(client, case, cold)
+        timings.append(ms)
+        sql_times.append(sql_ms)
+
+    timings.sort()
+    return ViewResult(
+        name=case.name,
+        method=case.method,
+        url=case.url,
+        status=case.status,
+        p50_ms=round(statistics.median(timings), 2),
+        p95_ms=round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+        queries=queries,
+        sql_ms=round(statistics.median(sql_times), 2),
+        query_budget=case.query_budget,
+        headers=case.headers,
+    )
+
+
+def to_json(results) -> dict:
+    return {r.key: asdict(r) for r in results}
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Regressions of `results` against `baseline` (both as written by
+    to_json): more queries, or a p50 more than `threshold` (0.2 = 20%)
+    slower. Returns a list of messages.
+    """
+    problems = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current["queries"] > before["queries"]:
+            problems.append(f"{name}: {before['queries']} -> {current['queries']} queries")
+        slower = current["p50_ms"] - before["p50_ms"]
+        if slower > MIN_REGRESSION_MS and current["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            problems.append(f"{name}: p50 {before['p50_ms']:.1f} -> {current['p50_ms']:.1f} ms")
+    return problems
@@ -1,32 +1,58 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.db import models
 from django.db import transaction
+from django.db.models import Q
 from .models import InventoryTransaction
 from django import forms
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
 from django.shortcuts import get_object_or_404, redirect, render
-from .forms import ProductForm
+from django.urls import reverse
+from .forms import ProductForm, ProductImportForm
 from .models import Product, Category
 
-import csv
 from datetime import datetime
-from django.http import HttpResponse
+import io
+import json
+import mimetypes
+import uuid
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.utils import timezone
 from django.utils.timezone import make_aware
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
-from core.permissions import require_group
+from core.permissions import in_group, require_group
+from core.replicas import use_replica
 
 from .audit import log
-from .models import AuditLog
+from . import fragments
+from .cache import cached
+from .exports import (
+    aproduct_csv_rows,
+    astock_as_of_csv_rows,
+    atransaction_csv_rows,
+    avaluation_csv_rows,
+    product_csv_rows,
+    stock_as_of_csv_rows,
+    transaction_csv_rows,
+    valuation_csv_rows,
+)
+from .jobs import ADMIN_KINDS, FILENAMES, HANDLERS, SYSTEM_KINDS, enqueue
+from .lowstock import feed
+from .models import AuditLog, ExportJob
+from .stock import BatchError, InsufficientStock, apply_movement, apply_movements, movements_from_csv
 
 from django.db.models import Q
 from django.db.models import Count
 from .forms import CategoryForm
 from core.permissions import require_group
 
-from django.core.paginator import Paginator
+from .pagination import keyset_paginate
+from .rollups import daily_totals
+from .search import search_products, search_transactions
+from .snapshots import as_of
+from .valuation import current as current_valuation
 
 class StockTransactionForm(forms.ModelForm):
     class Meta:
@@ -40,6 +66,7 @@ class StockTransactionForm(forms.ModelForm):
         return qty
 
 @login_required
+@use_replica
 def product_list(request):
     q = request.GET.get("q", "").strip()
     category_id = request.GET.get("category", "").strip()
@@ -53,35 +80,79 @@ def product_list(request):
     elif active == "0":
         products = products.filter(is_active=False)
 
+    keys = [("name", False), ("id", False)]
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(sku__icontains=q))
+        products = search_products(products, q)
+        keys = [("search_rank", False)] + keys
 
     if category_id:
         products = products.filter(category_id=category_id)
 
     if low_stock:
-        products = products.filter(quantity_on_hand__lte=models.F("reorder_level"))
-
-    products = products.order_by("name")
+        products = products.filter(is_low_stock=True)
+
+    def results_context():
+        # keyset pagination: no COUNT(*), no OFFSET
+        page_obj = keyset_paginate(
+            products,
+            keys,
+            cursor=request.GET.get("cursor", ""),
+            per_page=10,
+            approx_total=True,
+        )
+        return {"page_obj": page_obj, "filters": _filter_querystring(request)}
 
-    categories = Category.objects.order_by("name")
+    results = fragments.results(
+        request, "product_results", "inventory/partials/product_results.html",
+        ["products", "categories"], results_context,
+    )
+    return fragments.respond(
+        request,
+        "inventory/product_list.html",
+        results,
+        lambda: {
+            "categories": Category.objects.order_by("name"),
+            "q": q,
+            "category_id": category_id,
+            "low_stock": low_stock,
+            "active": active,
+        },
+    )
 
-    paginator = Paginator(products, 10)  # 10 per page
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+def _filter_querystring(request):
+    """Current GET filters minus the page cursor, for building pager links."""
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    return params.urlencode()
 
-    return render(
-    request,
-    "inventory/product_list.html",
-    {
-        "page_obj": page_obj,
-        "categories": categories,
-        "q": q,
-        "category_id": category_id,
-        "low_stock": low_stock,
-        "active": active,
-    },
-    )
+@login_required
+def low_stock_feed(request):
+    """
+    Low-stock transitions newer than ?after=<event id>, oldest first.
+    Pollers pass the last id they saw and only get products whose state changed.
+    """
+    try:
+        after = int(request.GET.get("after", "0"))
+    except ValueError:
+        after = 0
+    events = feed(after_id=after, limit=100, only_low=request.GET.get("only_low") == "1")
+
+    return JsonResponse({
+        "events": [
+            {
+                "id": e.id,
+                "product_id": e.product_id,
+                "sku": e.product.sku,
+                "name": e.product.name,
+                "became_low": e.became_low,
+                "quantity_on_hand": e.quantity_on_hand,
+                "reorder_level": e.reorder_level,
+                "created_at": e.created_at.isoformat(),
+            }
+            for e in events
+        ],
+        "last_id": events[-1].id if events else after,
+    })
 
 @login_required
 def product_detail(request, pk):
@@ -89,6 +160,19 @@ def product_detail(request, pk):
     transactions = product.transactions.all() [:10]
     return render(request, "inventory/product_detail.html", {"product": product, "transactions": transactions})
 
+@login_required
+@use_replica
+def product_history(request, pk):
+    """Every movement of one product, newest first, with the balance after each."""
+    product = get_object_or_404(Product, pk=pk)
+    page_obj = keyset_paginate(
+        product.transactions.select_related("created_by"),
+        [("created_at", True), ("id", True)],
+        cursor=request.GET.get("cursor", ""),
+        per_page=50,
+    )
+    return render(request, "inventory/product_history.html", {"product": product, "page_obj": page_obj})
+
 @require_group("Admin")
 @login_required
 def product_create(request):
@@ -103,6 +187,22 @@ def product_create(request):
 
     return render(request, "inventory/product_form.html", {"form": form, "mode": "create"})
 
+@require_group("Admin")
+@login_required
+def product_import(request):
+    """Stores the uploaded catalog CSV and queues its import for the worker."""
+    if request.method == "POST":
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            name = default_storage.save(f"imports/{uuid.uuid4().hex}.csv", upload)
+            job = enqueue("IMPORT_PRODUCTS", user=request.user, upload=name, filename=upload.name)
+            return redirect("inventory:export_job_detail", pk=job.pk)
+    else:
+        form = ProductImportForm()
+
+    return render(request, "inventory/product_import.html", {"form": form})
+
 @require_group("Admin")
 @login_required
 def product_update(request, pk):
@@ -111,7 +211,14 @@ def product_update(request, pk):
     if request.method == "POST":
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            product = form.save()
+            with transaction.atomic():
+                # stock may have moved since the product was loaded: keep the
+                # locked row's quantity and write back only the form's fields
+                current = Product.objects.select_for_update().values("quantity_on_hand", "is_low_stock").get(pk=pk)
+                product = form.save(commit=False)
+                product.quantity_on_hand = current["quantity_on_hand"]
+                product.is_low_stock = current["is_low_stock"]
+                product.save(update_fields=[*form._meta.fields, "updated_at"])
             log(request.user, "PRODUCT_UPDATE", "Product", product.id, f"Updated {product.name} ({product.sku})")
             return redirect("inventory:product_detail", pk=product.pk)
     else:
@@ -130,27 +237,23 @@ def stock_transaction(request, pk):
     if request.method == "POST":
         form = StockTransactionForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                tx = form.save(commit=False)
-                tx.product = product
-                tx.created_by = request.user
-
-                if tx.transaction_type == "OUT":
-                    if product.quantity_on_hand < tx.quantity:
-                        form.add_error("quantity", "Not enough stock available.")
-                        return render(
-                            request,
-                            "inventory/stock_form.html",
-                            {"form": form, "product": product},
-                        )
-                    product.quantity_on_hand -= tx.quantity
-                else:
-                    product.quantity_on_hand += tx.quantity
-
-                product.save()
-                tx.save()
-                action = "STOCK_IN" if tx.transaction_type == "IN" else "STOCK_OUT"
-                log(request.user, action, "Product", product.id, f"{action} {tx.quantity} for {product.sku}")
+            tx = form.save(commit=False)
+            try:
+                apply_movement(
+                    product,
+                    tx.transaction_type,
+                    tx.quantity,
+                    user=request.user,
+                    reference=tx.reference,
+                    note=tx.note,
+                )
+            except InsufficientStock:
+                form.add_error("quantity", "Not enough stock available.")
+                return render(
+                    request,
+                    "inventory/stock_form.html",
+                    {"form": form, "product": product},
+                )
 
             return redirect("inventory:product_detail", pk=product.pk)
     else:
@@ -162,42 +265,78 @@ def stock_transaction(request, pk):
         {"form": form, "product": product},
     )
 
+@require_POST
 @login_required
+def stock_batch(request):
+    """
+    Applies many movements in one all-or-nothing batch.
+
+    Accepts either JSON `{"movements": [{"sku", "type", "quantity", "reference", "note"}, ...]}`
+    or a CSV body (Content-Type: text/csv) with a sku,type,quantity,reference,note header.
+    """
+    try:
+        body = request.body.decode("utf-8")
+    except UnicodeDecodeError:
+        return JsonResponse({"ok": False, "errors": ["Body must be UTF-8."]}, status=400)
+
+    if request.content_type == "text/csv":
+        movements = list(movements_from_csv(io.StringIO(body)))
+    else:
+        try:
+            movements = json.loads(body).get("movements", [])
+        except (ValueError, AttributeError):
+            return JsonResponse({"ok": False, "errors": ["Invalid JSON body."]}, status=400)
+        if not isinstance(movements, list) or not all(isinstance(m, dict) for m in movements):
+            return JsonResponse({"ok": False, "errors": ['Expected {"movements": [{...}, ...]}.']}, status=400)
+
+    try:
+        result = apply_movements(movements, user=request.user)
+    except BatchError as exc:
+        return JsonResponse({"ok": False, "errors": exc.errors}, status=400)
+
+    return JsonResponse({
+        "ok": True,
+        "rows": result.rows,
+        "products": result.products,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+        "rows_per_second": round(result.rows_per_second, 1),
+    })
+
+@login_required
+@use_replica
 def reports_home(request):
     # default range: last 30 days
-    return render(request, "inventory/reports_home.html")
+    jobs = ExportJob.objects.filter(created_by=request.user)[:10]
+    return render(
+        request,
+        "inventory/reports_home.html",
+        {
+            "jobs": jobs,
+            "can_seed": in_group(request.user, "Admin") or request.user.is_superuser,
+            "daily_totals": daily_totals(days=30),
+        },
+    )
 
 
-@login_required
-def export_products_csv(request):
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="products.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        "SKU", "Name", "Category", "Cost", "Price",
-        "Qty On Hand", "Reorder Level", "Active", "Created", "Updated"
-    ])
-
-    qs = Product.objects.select_related("category").order_by("name")
-
-    for p in qs:
-        writer.writerow([
-            p.sku,
-            p.name,
-            p.category.name,
-            f"{p.cost:.2f}",
-            f"{p.price:.2f}",
-            p.quantity_on_hand,
-            p.reorder_level,
-            "Yes" if p.is_active else "No",
-            p.created_at.isoformat(),
-            p.updated_at.isoformat(),
-        ])
+def _is_asgi(request) -> bool:
+    # Under ASGI a sync iterator is read into a list before the first byte
+    # goes out, and under WSGI so is an async one: each server gets its own.
+    return isinstance(request, ASGIRequest)
 
+
+def _csv_response(rows, filename: str):
+    response = StreamingHttpResponse(rows, content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
+@login_required
+@use_replica
+async def export_products_csv(request):
+    rows = aproduct_csv_rows() if _is_asgi(request) else product_csv_rows()
+    return _csv_response(rows, "products.csv")
+
+
 def _parse_date(value: str):
     """
     Parses YYYY-MM-DD into an aware datetime at 00:00 local time.
@@ -213,109 +352,154 @@ def _parse_date(value: str):
 
 
 @login_required
-def export_transactions_csv(request):
+@use_replica
+async def export_transactions_csv(request):
     # Optional filters
     start = _parse_date(request.GET.get("start", ""))
     end = _parse_date(request.GET.get("end", ""))
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="transactions.csv"'
+    rows = atransaction_csv_rows(start, end) if _is_asgi(request) else transaction_csv_rows(start, end)
+    return _csv_response(rows, "transactions.csv")
 
-    writer = csv.writer(response)
-    writer.writerow([
-        "Date", "Type", "SKU", "Product",
-        "Quantity", "Reference", "Note", "User"
-    ])
+def _as_of_day(request):
+    """?date=YYYY-MM-DD, defaulting to (and capped at) today."""
+    today = timezone.localdate()
+    day = _parse_date(request.GET.get("date", ""))
+    return min(day.date(), today) if day else today
 
-    qs = InventoryTransaction.objects.select_related("product", "created_by").order_by("-created_at")
 
-    if start:
-        qs = qs.filter(created_at__gte=start)
-    if end:
-        # include the entire end day by adding 1 day and using lt
-        qs = qs.filter(created_at__lt=end.replace(hour=23, minute=59, second=59))
-
-    for t in qs:
-        writer.writerow([
-            t.created_at.isoformat(),
-            t.transaction_type,
-            t.product.sku,
-            t.product.name,
-            t.quantity,
-            t.reference,
-            t.note,
-            t.created_by.username if t.created_by else "",
-        ])
+@login_required
+@use_replica
+def stock_as_of(request):
+    day = _as_of_day(request)
+    page_obj = keyset_paginate(
+        Product.objects.select_related("category"),
+        [("name", False), ("id", False)],
+        cursor=request.GET.get("cursor", ""),
+        per_page=50,
+    )
+    # only this page's products: a few index lookups, not a ledger scan
+    quantities = as_of(day, [p.pk for p in page_obj])
+    rows = [(p, quantities.get(p.pk, 0)) for p in page_obj]
+
+    return render(
+        request,
+        "inventory/stock_as_of.html",
+        {
+            "day": day,
+            "rows": rows,
+            "page_obj": page_obj,
+            "filters": _filter_querystring(request),
+        },
+    )
 
-    return response
 
 @login_required
-def export_transactions_pdf(request):
-    start = _parse_date(request.GET.get("start", ""))
-    end = _parse_date(request.GET.get("end", ""))
+@use_replica
+async def export_stock_as_of_csv(request):
+    day = _as_of_day(request)
+    rows = astock_as_of_csv_rows(day) if _is_asgi(request) else stock_as_of_csv_rows(day)
+    return _csv_response(rows, f"stock-{day.isoformat()}.csv")
 
-    qs = InventoryTransaction.objects.select_related("product", "created_by").order_by("-created_at")
-    if start:
-        qs = qs.filter(created_at__gte=start)
-    if end:
-        qs = qs.filter(created_at__lte=end.replace(hour=23, minute=59, second=59))
 
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="transactions.pdf"'
-
-    c = canvas.Canvas(response, pagesize=letter)
-    width, height = letter
-
-    y = height - 50
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, y, "Inventory Transactions Report")
-    y -= 20
-
-    c.setFont("Helvetica", 10)
-    date_line = "All time"
-    if start and end:
-        date_line = f"From {start.date()} to {end.date()}"
-    elif start:
-        date_line = f"From {start.date()}"
-    elif end:
-        date_line = f"Up to {end.date()}"
-
-    c.drawString(50, y, date_line)
-    y -= 25
-
-    # Column headers
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(50, y, "Date")
-    c.drawString(150, y, "Type")
-    c.drawString(200, y, "SKU")
-    c.drawString(280, y, "Product")
-    c.drawString(470, y, "Qty")
-    y -= 15
-
-    c.setFont("Helvetica", 9)
-
-    for t in qs[:500]:  # cap to keep pdf sane
-        if y < 60:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(50, y, "Date")
-            c.drawString(150, y, "Type")
-            c.drawString(200, y, "SKU")
-            c.drawString(280, y, "Product")
-            c.drawString(470, y, "Qty")
-            y -= 15
-            c.setFont("Helvetica", 9)
-
-        c.drawString(50, y, t.created_at.strftime("%Y-%m-%d"))
-        c.drawString(150, y, t.transaction_type)
-        c.drawString(200, y, t.product.sku[:12])
-        c.drawString(280, y, t.product.name[:30])
-        c.drawRightString(495, y, str(t.quantity))
-        y -= 14
-
-    c.showPage()
-    c.save()
+@login_required
+@use_replica
+def valuation_report(request):
+    return render(request, "inventory/valuation.html", {"report": current_valuation()})
+
+
+@login_required
+@use_replica
+async def export_valuation_csv(request):
+    report = await sync_to_async(current_valuation)()
+    if report is None:
+        # nothing computed yet; the page says so
+        return redirect("inventory:valuation_report")
+    rows = avaluation_csv_rows(report) if _is_asgi(request) else valuation_csv_rows(report)
+    return _csv_response(rows, "valuation.csv")
+
+
+def _get_job_for(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise Http404
+    return job
+
+
+@require_POST
+@login_required
+def export_job_create(request):
+    kind = request.POST.get("kind", "")
+    if kind not in HANDLERS or kind in SYSTEM_KINDS:
+        raise Http404
+    if kind in ADMIN_KINDS and not (in_group(request.user, "Admin") or request.user.is_superuser):
+        raise PermissionDenied("You do not have permission to run this job.")
+
+    start = _parse_date(request.POST.get("start", ""))
+    end = _parse_date(request.POST.get("end", ""))
+    job = enqueue(
+        kind,
+        user=request.user,
+        start=start.isoformat() if start else "",
+        end=end.isoformat() if end else "",
+    )
+    return redirect("inventory:export_job_detail", pk=job.pk)
+
+
+@login_required
+def export_job_detail(request, pk):
+    job = _get_job_for(request, pk)
+    return render(request, "inventory/export_job.html", {"job": job})
+
+
+async def _aget_job_for(request, pk):
+    try:
+        job = await ExportJob.objects.aget(pk=pk)
+    except ExportJob.DoesNotExist:
+        raise Http404
+    user = await request.auser()
+    if job.created_by_id != user.id and not user.is_superuser:
+        raise Http404
+    return job
+
+
+@login_required
+async def export_job_status(request, pk):
+    # polled every few seconds by every open job page
+    job = await _aget_job_for(request, pk)
+    return JsonResponse({
+        "id": job.pk,
+        "status": job.status,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "download_url": reverse("inventory:export_job_download", args=[job.pk]) if job.status == "DONE" and job.result else None,
+    })
+
+
+async def _afile_chunks(f, chunk_size: int = 64 * 1024):
+    try:
+        while chunk := await sync_to_async(f.read)(chunk_size):
+            yield chunk
+    finally:
+        await sync_to_async(f.close)()
+
+
+@login_required
+async def export_job_download(request, pk):
+    job = await _aget_job_for(request, pk)
+    if job.status != "DONE" or not job.result:
+        raise Http404
+    filename = FILENAMES[job.kind]
+    f = await sync_to_async(job.result.open)("rb")
+    if not _is_asgi(request):
+        return FileResponse(f, as_attachment=True, filename=filename)
+
+    response = StreamingHttpResponse(
+        _afile_chunks(f),
+        content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    )
+    response["Content-Length"] = str(await sync_to_async(job.result.storage.size)(job.result.name))
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 @require_group("Admin")
@@ -325,20 +509,19 @@ def audit_list(request):
     return render(request, "inventory/audit_list.html", {"logs": logs})
 
 @login_required
+@use_replica
 def transaction_list(request):
     q = request.GET.get("q", "").strip()
     tx_type = request.GET.get("type", "").strip()  # IN / OUT / empty
     start = _parse_date(request.GET.get("start", ""))
     end = _parse_date(request.GET.get("end", ""))
 
-    qs = InventoryTransaction.objects.select_related("product", "created_by").order_by("-created_at")
+    # products are fetched by pk for the page only; joining them into the
+    # paged query lets some planners drive the join from the product table
+    qs = InventoryTransaction.objects.select_related("created_by").prefetch_related("product")
 
     if q:
-        qs = qs.filter(
-            Q(product__name__icontains=q) |
-            Q(product__sku__icontains=q) |
-            Q(reference__icontains=q)
-        )
+        qs = search_transactions(qs, q)
 
     if tx_type in ("IN", "OUT"):
         qs = qs.filter(transaction_type=tx_type)
@@ -348,15 +531,25 @@ def transaction_list(request):
     if end:
         qs = qs.filter(created_at__lte=end.replace(hour=23, minute=59, second=59))
 
-    paginator = Paginator(qs, 15)  # 15 per page
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    def results_context():
+        page_obj = keyset_paginate(
+            qs,
+            [("created_at", True), ("id", True)],
+            cursor=request.GET.get("cursor", ""),
+            per_page=15,
+            approx_total=True,
+        )
+        return {"page_obj": page_obj, "filters": _filter_querystring(request)}
 
-    return render(
+    results = fragments.results(
+        request, "transaction_results", "inventory/partials/transaction_results.html",
+        ["transactions", "products"], results_context,
+    )
+    return fragments.respond(
         request,
         "inventory/transaction_list.html",
-        {
-            "page_obj": page_obj,
+        results,
+        lambda: {
             "q": q,
             "tx_type": tx_type,
             "start": request.GET.get("start", ""),
@@ -365,11 +558,16 @@ def transaction_list(request):
     )
 
 @login_required
+@use_replica
 def category_list(request):
-    categories = (
-        Category.objects
-        .annotate(product_count=Count("products"))
-        .order_by("name")
+    categories = cached(
+        "category_list",
+        ["categories", "products"],
+        lambda: list(
+            Category.objects
+            .annotate(product_count=Count("products"))
+            .order_by("name")
+        ),
     )
     return render(request, "inventory/category_list.html", {"categories": categories})
 